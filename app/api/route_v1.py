@@ -1,58 +1,145 @@
+import asyncio
+import json
 import os
+from datetime import datetime, timedelta
 from typing import Optional
 
 import ulid
-from fastapi import APIRouter, Depends, HTTPException, Form, File, UploadFile, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Form, File, UploadFile, BackgroundTasks, Request, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.controllers.face_controller import create_face_and_embedding, track_faces_and_embeddings, process_faces_from_image
-from app.crud import crud_person, crud_tracking, crud_camera
-from app.dependencies.db import get_db
-from app.schemas.camera import CameraOut, CameraCreate
+from app.controllers.enrollment_controller import run_enrollment_job, BULK_DIR
+from app.controllers.face_controller import create_face_and_embedding, track_faces_and_embeddings, search_detections, \
+    frame_scheduler
+from app.core.config import settings
+from app.core.events import event_broker
+from app.core.scheduler import Frame
+from app.crud import crud_person, crud_tracking, crud_camera, crud_gallery, crud_enrollment
+from app.dependencies.db import get_db, get_async_db
+from app.schemas.camera import CameraOut, CameraCreate, CameraUpdate
+from app.schemas.detection import DetectionSearchResult
+from app.schemas.enrollment import EnrollmentJobOut, EnrollmentItemOut
 from app.schemas.face import FaceOut
+from app.schemas.gallery import GalleryCreate, GalleryOut, GalleryUpdate
 from app.schemas.person import PersonCreate, PersonOut
-from app.schemas.tracking import TrackingOut, TrackingOutWithRelations, TrackingMatchOut
+from app.schemas.tracking import TrackingOut, TrackingOutWithRelations, TrackingMatchOut, TrackingRollupOut, CameraVisitorOut
 
 router = APIRouter()
 
+def _local_time(t: Optional[datetime]) -> Optional[datetime]:
+    # Tracking rows and detections are stamped in naive server local time
+    return t.astimezone().replace(tzinfo=None) if t is not None and t.tzinfo else t
+
 # Person Endpoints
 @router.get("/persons", response_model=list[PersonOut], tags=["Persons"])
-def get_persons(db: Session = Depends(get_db)):
-    return crud_person.get_multi(db)
+async def get_persons(db: AsyncSession = Depends(get_async_db)):
+    return await crud_person.get_multi(db)
 
 @router.post("/persons", response_model=PersonOut, tags=["Persons"])
-def create_person(person_in: PersonCreate, db: Session = Depends(get_db)):
-    return crud_person.create(db, person_in)
+async def create_person(person_in: PersonCreate, db: AsyncSession = Depends(get_async_db)):
+    return await crud_person.create(db, person_in)
 
 @router.get("/persons/{person_id}", response_model=PersonOut, tags=["Persons"])
-def get_person(person_id: str, db: Session = Depends(get_db)):
-    db_person = crud_person.get(db, person_id)
+async def get_person(person_id: str, db: AsyncSession = Depends(get_async_db)):
+    db_person = await crud_person.get(db, person_id)
     if not db_person:
         raise HTTPException(status_code=404, detail="Person not found")
     return db_person
 
+@router.get("/persons/{person_id}/whereabouts", response_model=list[TrackingRollupOut], tags=["Persons"])
+async def get_person_whereabouts(
+    person_id: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db)):
+    """
+    Hourly sightings of a person per camera between ``start`` and ``end`` (default: the last 24 hours).
+    """
+    start, end = _local_time(start), _local_time(end)
+    end = end or datetime.now()
+    start = start or end - timedelta(days=1)
+    return await crud_tracking.get_rollups_by_person(db, person_id, start, end)
+
 # Face Endpoints
 @router.post("/faces", response_model=FaceOut, tags=["Faces"])
 async def create_face(person_id: str = Form(...), file: UploadFile = File(...), db: Session = Depends(get_db)):
     return await create_face_and_embedding(db=db, person_id=person_id, file=file)
 
+@router.post("/faces/bulk", response_model=EnrollmentJobOut, tags=["Faces"])
+async def create_faces_bulk(background_tasks: BackgroundTasks, file: UploadFile = File(...), db: Session = Depends(get_db)):
+    """
+    Enrolls a zip archive of ``<person_id>/<image>`` folders, or with a ``manifest.csv``
+    (``person_id,path``), as a background job.
+    """
+    if not file.filename.lower().endswith(".zip"):
+        raise HTTPException(status_code=400, detail="Unsupported file type")
+
+    archive_path = os.path.join(BULK_DIR, f"{ulid.new()}.zip")
+    with open(archive_path, "wb") as f:
+        while chunk := await file.read(1024 * 1024):
+            f.write(chunk)
+
+    job = await run_in_threadpool(crud_enrollment.create, db, os.path.abspath(archive_path))
+    background_tasks.add_task(run_enrollment_job, job.id)
+    return job
+
+@router.get("/faces/bulk/{job_id}", response_model=EnrollmentJobOut, tags=["Faces"])
+def get_faces_bulk_job(job_id: str, db: Session = Depends(get_db)):
+    job = crud_enrollment.get(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Enrollment job not found")
+    return job
+
+@router.get("/faces/bulk/{job_id}/items", response_model=list[EnrollmentItemOut], tags=["Faces"])
+def get_faces_bulk_items(job_id: str, status: Optional[str] = None, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+    return crud_enrollment.get_items(db, job_id, status=status, skip=skip, limit=limit)
+
+@router.post("/faces/bulk/{job_id}/resume", response_model=EnrollmentJobOut, tags=["Faces"])
+def resume_faces_bulk_job(job_id: str, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    job = crud_enrollment.get(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Enrollment job not found")
+    if job.status == "completed" or (job.status == "running" and not crud_enrollment.is_stale(db, job, settings.ENROLLMENT_STALE_SECONDS)):
+        raise HTTPException(status_code=409, detail=f"Enrollment job is {job.status}")
+    background_tasks.add_task(run_enrollment_job, job.id)
+    return job
+
 # Tracking Endpoints
 @router.post("/tracking", response_model=list[TrackingMatchOut], tags=["Tracking"])
-async def create_tracking(file: UploadFile = File(...), db: Session = Depends(get_db)):
-    return await track_faces_and_embeddings(db=db, file=file)
+async def create_tracking(
+    file: UploadFile = File(...),
+    gallery_id: Optional[str] = Form(None),
+    db: AsyncSession = Depends(get_async_db)):
+    return await track_faces_and_embeddings(db=db, file=file, gallery_id=gallery_id)
 
 @router.post("/tracking/cctv", response_model=dict, tags=["CCTV Feed"])
 async def process_cctv_feed(
-    background_tasks: BackgroundTasks,
     camera_id: Optional[str] = Form(None),
+    gallery_id: Optional[str] = Form(None),
     file: UploadFile = File(...),
-    db: Session = Depends(get_db)):
+    db: AsyncSession = Depends(get_async_db)):
     """
-    Receives CCTV image and processes it in background.
+    Receives CCTV image and queues it for processing in background.
+    Matches are searched within ``gallery_id`` if given, else within the camera's galleries.
+    Frames over the camera's rate limit are rejected with 429. The limit is per
+    worker process, so the effective rate is CCTV_RATE_PER_SECOND times the workers.
     """
     ext = file.filename.rsplit(".", 1)[-1].lower()
     if ext not in {"jpg", "jpeg", "png", "webp"}:
         raise HTTPException(status_code=400, detail="Unsupported file type")
+    if gallery_id and not await crud_gallery.get(db, gallery_id):
+        raise HTTPException(status_code=404, detail="Gallery not found")
+    # Unknown ids would each get a fresh rate limit bucket
+    if camera_id and not await crud_camera.get(db, camera_id):
+        raise HTTPException(status_code=404, detail="Camera not found")
+
+    retry_after = frame_scheduler.admit(camera_id)
+    if retry_after is not None:
+        raise HTTPException(status_code=429, detail="Camera frame rate exceeded",
+                            headers={"Retry-After": str(max(1, round(retry_after)))})
 
     case_id = str(ulid.new())
     filename = f"{case_id}.{ext}"
@@ -61,27 +148,196 @@ async def process_cctv_feed(
     with open(file_path, "wb") as f:
         f.write(await file.read())
 
-    # ✅ This runs after response
-    background_tasks.add_task(process_faces_from_image, file_path, camera_id, db)
+    # ✅ Processed by the scheduler's workers after the response
+    frame_scheduler.enqueue(Frame(path=file_path, camera_id=camera_id, gallery_id=gallery_id))
 
     return {"message": "We have received the image, and it is being processed."}
 
+@router.get("/tracking/cctv/stats", response_model=dict, tags=["CCTV Feed"])
+async def get_cctv_stats():
+    """
+    Frame scheduler counters and per-camera queue depth and lag for this worker.
+    """
+    return frame_scheduler.snapshot()
+
 @router.get("/tracking", response_model=list[TrackingOutWithRelations], tags=["Tracking"])
-def get_tracking_list(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud_tracking.get_multi(db, skip=skip, limit=limit)
+async def get_tracking_list(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_async_db)):
+    return await crud_tracking.get_multi(db, skip=skip, limit=limit)
+
+def _event_matches(event: dict, camera_id: Optional[str], person_id: Optional[str]) -> bool:
+    return (camera_id is None or event.get("camera_id") == camera_id) and \
+        (person_id is None or event.get("person_id") == person_id)
+
+@router.get("/tracking/stream", tags=["Tracking"])
+async def stream_tracking(request: Request, camera_id: Optional[str] = None, person_id: Optional[str] = None):
+    """
+    Server-Sent Events stream of new tracking events, optionally filtered by camera or person.
+    """
+    async def events():
+        async with event_broker.subscribe() as queue:
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if _event_matches(event, camera_id, person_id):
+                    yield f"event: tracking\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@router.websocket("/tracking/ws")
+async def tracking_socket(websocket: WebSocket, camera_id: Optional[str] = None, person_id: Optional[str] = None):
+    """
+    WebSocket stream of new tracking events, optionally filtered by camera or person.
+    """
+    await websocket.accept()
+
+    async def wait_for_disconnect():
+        # Clients never send anything; reading is how an idle disconnect is noticed
+        try:
+            while (await websocket.receive())["type"] != "websocket.disconnect":
+                pass
+        except (WebSocketDisconnect, RuntimeError):
+            pass
+
+    disconnected = asyncio.create_task(wait_for_disconnect())
+    async with event_broker.subscribe() as queue:
+        try:
+            while True:
+                next_event = asyncio.create_task(queue.get())
+                await asyncio.wait({next_event, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+                if disconnected.done():
+                    next_event.cancel()
+                    break
+                event = next_event.result()
+                if _event_matches(event, camera_id, person_id):
+                    await websocket.send_json(event)
+        except (WebSocketDisconnect, RuntimeError, ConnectionError):
+            pass
+        finally:
+            disconnected.cancel()
 
 @router.get("/tracking/{tracking_id}", response_model=TrackingOutWithRelations, tags=["Tracking"])
-def get_tracking(tracking_id: str, db: Session = Depends(get_db)):
-    tracking = crud_tracking.get(db, tracking_id)
+async def get_tracking(tracking_id: str, db: AsyncSession = Depends(get_async_db)):
+    tracking = await crud_tracking.get(db, tracking_id)
     if not tracking:
         raise HTTPException(status_code=404, detail="Tracking record not found")
     return tracking
 
+# Detection Endpoints
+@router.post("/detections/search", response_model=DetectionSearchResult, tags=["Detections"])
+async def search_detection_history(
+    file: UploadFile = File(...),
+    start: datetime = Form(...),
+    end: datetime = Form(...),
+    top_k: int = Form(50, gt=0, le=1000),
+    threshold: float = Form(0.5),
+    camera_id: Optional[str] = Form(None)):
+    """
+    Finds where the face in the image appeared across all CCTV detections between ``start`` and ``end``.
+    """
+    start, end = _local_time(start), _local_time(end)
+    return await search_detections(file, start, end, top_k=top_k, threshold=threshold, camera_id=camera_id)
+
 # Camera Endpoints
 @router.post("/cameras", response_model=CameraOut, tags=["Cameras"])
-def create_camera(camera_in: CameraCreate, db: Session = Depends(get_db)):
-    return crud_camera.create(db, camera_in)
+async def create_camera(camera_in: CameraCreate, db: AsyncSession = Depends(get_async_db)):
+    return await crud_camera.create(db, camera_in)
 
 @router.get("/cameras/{camera_id}", response_model=CameraOut, tags=["Cameras"])
-def get_camera(camera_id: str, db: Session = Depends(get_db)):
-    return crud_camera.get(db, camera_id)
+async def get_camera(camera_id: str, db: AsyncSession = Depends(get_async_db)):
+    return await crud_camera.get(db, camera_id)
+
+async def _get_camera_or_404(db: AsyncSession, camera_id: str):
+    camera = await crud_camera.get(db, camera_id)
+    if not camera:
+        raise HTTPException(status_code=404, detail="Camera not found")
+    return camera
+
+@router.patch("/cameras/{camera_id}", response_model=CameraOut, tags=["Cameras"])
+async def update_camera(camera_id: str, camera_in: CameraUpdate, db: AsyncSession = Depends(get_async_db)):
+    camera = await _get_camera_or_404(db, camera_id)
+    return await crud_camera.update(db, camera, camera_in)
+
+@router.get("/cameras/{camera_id}/visitors", response_model=list[CameraVisitorOut], tags=["Cameras"])
+async def get_camera_visitors(
+    camera_id: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db)):
+    """
+    Persons seen by a camera between ``start`` and ``end`` (default: today).
+    """
+    start, end = _local_time(start), _local_time(end)
+    start = start or datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    end = end or start + timedelta(days=1)
+    return await crud_tracking.get_visitors_by_camera(db, camera_id, start, end)
+
+@router.get("/cameras/{camera_id}/galleries", response_model=list[GalleryOut], tags=["Cameras"])
+async def get_camera_galleries(camera_id: str, db: AsyncSession = Depends(get_async_db)):
+    return await crud_gallery.get_by_camera(db, camera_id)
+
+# Gallery Endpoints
+@router.get("/galleries", response_model=list[GalleryOut], tags=["Galleries"])
+async def get_galleries(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_async_db)):
+    return await crud_gallery.get_multi(db, skip=skip, limit=limit)
+
+@router.post("/galleries", response_model=GalleryOut, tags=["Galleries"])
+async def create_gallery(gallery_in: GalleryCreate, db: AsyncSession = Depends(get_async_db)):
+    return await crud_gallery.create(db, gallery_in)
+
+async def _get_gallery_or_404(db: AsyncSession, gallery_id: str):
+    gallery = await crud_gallery.get(db, gallery_id)
+    if not gallery:
+        raise HTTPException(status_code=404, detail="Gallery not found")
+    return gallery
+
+async def _get_person_or_404(db: AsyncSession, person_id: str):
+    person = await crud_person.get(db, person_id)
+    if not person:
+        raise HTTPException(status_code=404, detail="Person not found")
+    return person
+
+@router.get("/galleries/{gallery_id}", response_model=GalleryOut, tags=["Galleries"])
+async def get_gallery(gallery_id: str, db: AsyncSession = Depends(get_async_db)):
+    return await _get_gallery_or_404(db, gallery_id)
+
+@router.patch("/galleries/{gallery_id}", response_model=GalleryOut, tags=["Galleries"])
+async def update_gallery(gallery_id: str, gallery_in: GalleryUpdate, db: AsyncSession = Depends(get_async_db)):
+    gallery = await _get_gallery_or_404(db, gallery_id)
+    return await crud_gallery.update(db, gallery, gallery_in)
+
+@router.delete("/galleries/{gallery_id}", response_model=GalleryOut, tags=["Galleries"])
+async def delete_gallery(gallery_id: str, db: AsyncSession = Depends(get_async_db)):
+    gallery = await _get_gallery_or_404(db, gallery_id)
+    return await crud_gallery.remove(db, gallery.id)
+
+@router.get("/galleries/{gallery_id}/persons", response_model=list[PersonOut], tags=["Galleries"])
+async def get_gallery_persons(gallery_id: str, db: AsyncSession = Depends(get_async_db)):
+    gallery = await _get_gallery_or_404(db, gallery_id)
+    return await crud_gallery.get_persons(db, gallery.id)
+
+@router.put("/galleries/{gallery_id}/persons/{person_id}", response_model=GalleryOut, tags=["Galleries"])
+async def add_gallery_person(gallery_id: str, person_id: str, db: AsyncSession = Depends(get_async_db)):
+    gallery = await _get_gallery_or_404(db, gallery_id)
+    person = await _get_person_or_404(db, person_id)
+    return await crud_gallery.add_person(db, gallery, person.id)
+
+@router.delete("/galleries/{gallery_id}/persons/{person_id}", response_model=GalleryOut, tags=["Galleries"])
+async def remove_gallery_person(gallery_id: str, person_id: str, db: AsyncSession = Depends(get_async_db)):
+    gallery = await _get_gallery_or_404(db, gallery_id)
+    person = await _get_person_or_404(db, person_id)
+    return await crud_gallery.remove_person(db, gallery, person.id)
+
+@router.put("/galleries/{gallery_id}/cameras/{camera_id}", response_model=GalleryOut, tags=["Galleries"])
+async def add_gallery_camera(gallery_id: str, camera_id: str, db: AsyncSession = Depends(get_async_db)):
+    gallery = await _get_gallery_or_404(db, gallery_id)
+    camera = await _get_camera_or_404(db, camera_id)
+    return await crud_gallery.add_camera(db, gallery, camera.id)
+
+@router.delete("/galleries/{gallery_id}/cameras/{camera_id}", response_model=GalleryOut, tags=["Galleries"])
+async def remove_gallery_camera(gallery_id: str, camera_id: str, db: AsyncSession = Depends(get_async_db)):
+    gallery = await _get_gallery_or_404(db, gallery_id)
+    camera = await _get_camera_or_404(db, camera_id)
+    return await crud_gallery.remove_camera(db, gallery, camera.id)
@@ -0,0 +1,61 @@
+"""Bulk-enroll faces from a zip archive or directory.
+
+    python -m app.cli.enroll faces.zip
+    python -m app.cli.enroll --resume <job_id>
+
+Writes to the FAISS index files are serialized with a file lock, and running
+API workers reload the index when the files change, so no restart is needed.
+A job left ``running`` by a crashed process can be resumed once it has made no
+progress for ENROLLMENT_STALE_SECONDS.
+"""
+import argparse
+import os
+
+from app.controllers.enrollment_controller import run_enrollment_job
+from app.core.config import settings
+from app.crud import crud_enrollment
+from app.db.base import Base
+from app.db.session import SessionLocal, engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk face enrollment")
+    parser.add_argument("source", nargs="?", help="zip archive or directory of <person_id>/<image> or manifest.csv")
+    parser.add_argument("--resume", metavar="JOB_ID", help="resume an interrupted job")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    if not args.source and not args.resume:
+        parser.error("either source or --resume is required")
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        if args.resume:
+            job = crud_enrollment.get(db, args.resume)
+            if not job:
+                parser.error(f"job {args.resume} not found")
+            if job.status == "completed":
+                parser.error(f"job {args.resume} is already completed")
+            if job.status == "running" and not crud_enrollment.is_stale(db, job, settings.ENROLLMENT_STALE_SECONDS):
+                parser.error(f"job {args.resume} is still running")
+        else:
+            job = crud_enrollment.create(db, os.path.abspath(args.source))
+        job_id = job.id
+    finally:
+        db.close()
+
+    print(f"[ENROLL] Running job {job_id}")
+    run_enrollment_job(job_id, batch_size=args.batch_size, workers=args.workers)
+
+    db = SessionLocal()
+    try:
+        job = crud_enrollment.get(db, job_id)
+        print(f"[ENROLL] Job {job.id} {job.status}: {job.succeeded}/{job.total} enrolled, {job.failed} failed")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""Build and verify quantized face model packs.
+
+    python -m app.cli.models quantize --src buffalo_l --dst buffalo_l_int8 --calibration samples/
+    python -m app.cli.models check --reference buffalo_l --candidate buffalo_l_int8 --images samples/
+
+Set FACE_MODEL_NAME=buffalo_l_int8 once ``check`` passes to serve the quantized pack.
+"""
+import argparse
+import os
+import shutil
+import sys
+import time
+
+import cv2
+import numpy as np
+from PIL import Image
+from insightface.utils import face_align
+from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_dynamic, quantize_static
+
+from app.core.model_pack import load_face_analysis, model_pack_dir
+
+IMAGE_EXTS = {"jpg", "jpeg", "png", "webp"}
+
+
+def _images(directory: str, limit: int):
+    names = sorted(n for n in os.listdir(directory) if n.rsplit(".", 1)[-1].lower() in IMAGE_EXTS)
+    for name in names[:limit]:
+        try:
+            yield name, np.array(Image.open(os.path.join(directory, name)).convert("RGB"))
+        except Exception as e:
+            print(f"Skipping {name}: {e}")
+
+
+def _det_blob(det_model, img: np.ndarray) -> np.ndarray:
+    """Detector input for ``img``, letterboxed the way RetinaFace.detect does it."""
+    width, height = det_model.input_size
+    scale = min(width / img.shape[1], height / img.shape[0])
+    resized = cv2.resize(img, (int(img.shape[1] * scale), int(img.shape[0] * scale)))
+    det_img = np.zeros((height, width, 3), dtype=np.uint8)
+    det_img[:resized.shape[0], :resized.shape[1], :] = resized
+    return cv2.dnn.blobFromImage(det_img, 1.0 / det_model.input_std, (width, height),
+                                 (det_model.input_mean,) * 3, swapRB=True)
+
+
+def _rec_blob(rec_model, aligned: np.ndarray) -> np.ndarray:
+    return cv2.dnn.blobFromImages([aligned], 1.0 / rec_model.input_std, rec_model.input_size,
+                                  (rec_model.input_mean,) * 3, swapRB=True)
+
+
+class _BlobReader(CalibrationDataReader):
+    def __init__(self, input_name: str, blobs):
+        self.feeds = iter([{input_name: blob} for blob in blobs])
+
+    def get_next(self):
+        return next(self.feeds, None)
+
+
+def quantize(args):
+    reference = load_face_analysis(args.src, modules="detection,recognition")
+    det_model = reference.models["detection"]
+    rec_model = reference.models["recognition"]
+
+    src_dir, dst_dir = model_pack_dir(args.src), model_pack_dir(args.dst)
+    os.makedirs(dst_dir, exist_ok=True)
+    for name in os.listdir(src_dir):
+        if name.endswith(".onnx") and name not in {os.path.basename(det_model.model_file), os.path.basename(rec_model.model_file)}:
+            shutil.copy2(os.path.join(src_dir, name), os.path.join(dst_dir, name))
+
+    det_blobs, rec_blobs = [], []
+    if args.calibration:
+        for _, img in _images(args.calibration, args.limit):
+            det_blobs.append(_det_blob(det_model, img))
+            for face in reference.get(img):
+                rec_blobs.append(_rec_blob(rec_model, face_align.norm_crop(img, landmark=face.kps, image_size=rec_model.input_size[0])))
+
+    for model, blobs in ((det_model, det_blobs), (rec_model, rec_blobs)):
+        target = os.path.join(dst_dir, os.path.basename(model.model_file))
+        if blobs:
+            print(f"Quantizing {model.model_file} (static, {len(blobs)} calibration inputs)")
+            quantize_static(model.model_file, target, _BlobReader(model.input_name, blobs),
+                            quant_format=QuantFormat.QDQ, per_channel=True,
+                            activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+        else:
+            print(f"Quantizing {model.model_file} (dynamic, no calibration data)")
+            quantize_dynamic(model.model_file, target, weight_type=QuantType.QUInt8)
+    print(f"Wrote {dst_dir}")
+
+
+def _iou(a: np.ndarray, b: np.ndarray) -> float:
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def check(args) -> int:
+    reference = load_face_analysis(args.reference, modules="detection,recognition")
+    candidate = load_face_analysis(args.candidate, modules="detection,recognition")
+    ref_rec, cand_rec = reference.models["recognition"], candidate.models["recognition"]
+
+    similarities, detected, missed = [], 0, 0
+    ref_time = cand_time = 0.0
+    for name, img in _images(args.images, args.limit):
+        start = time.perf_counter()
+        ref_faces = reference.get(img)
+        ref_time += time.perf_counter() - start
+        start = time.perf_counter()
+        cand_faces = candidate.get(img)
+        cand_time += time.perf_counter() - start
+
+        for face in ref_faces:
+            if any(_iou(face.bbox, other.bbox) >= 0.5 for other in cand_faces):
+                detected += 1
+            else:
+                missed += 1
+            # Same aligned crop for both models, so only the recognizer is compared
+            aligned = face_align.norm_crop(img, landmark=face.kps, image_size=ref_rec.input_size[0])
+            a, b = ref_rec.get_feat(aligned).ravel(), cand_rec.get_feat(aligned).ravel()
+            similarities.append(float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))))
+
+    if not similarities:
+        print("No faces found in the check images.")
+        return 1
+
+    sims = np.array(similarities)
+    recall = detected / (detected + missed)
+    print(f"Faces compared:        {len(sims)}")
+    print(f"Embedding cosine mean: {sims.mean():.4f}  min: {sims.min():.4f}  p5: {np.percentile(sims, 5):.4f}")
+    print(f"Detection agreement:   {recall:.2%} (IoU >= 0.5)")
+    print(f"Time {args.reference}: {ref_time:.2f}s  {args.candidate}: {cand_time:.2f}s")
+
+    passed = sims.mean() >= args.min_similarity and recall >= args.min_recall
+    print("PASS" if passed else "FAIL")
+    return 0 if passed else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Face model pack tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    q = sub.add_parser("quantize", help="write an INT8 copy of a model pack's detector and recognizer")
+    q.add_argument("--src", default="buffalo_l")
+    q.add_argument("--dst", default="buffalo_l_int8")
+    q.add_argument("--calibration", help="directory of sample frames for static quantization")
+    q.add_argument("--limit", type=int, default=200)
+
+    c = sub.add_parser("check", help="compare a candidate pack's embeddings against a reference pack")
+    c.add_argument("--reference", default="buffalo_l")
+    c.add_argument("--candidate", default="buffalo_l_int8")
+    c.add_argument("--images", required=True)
+    c.add_argument("--limit", type=int, default=500)
+    c.add_argument("--min-similarity", type=float, default=0.98)
+    c.add_argument("--min-recall", type=float, default=0.97)
+
+    args = parser.parse_args()
+    if args.command == "quantize":
+        quantize(args)
+    else:
+        sys.exit(check(args))
+
+
+if __name__ == "__main__":
+    main()
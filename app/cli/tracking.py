@@ -0,0 +1,49 @@
+"""Tracking storage maintenance, meant to run daily from cron.
+
+    python -m app.cli.tracking retention [--days 90] [--no-archive]
+    python -m app.cli.tracking rebuild-rollups
+"""
+import argparse
+import asyncio
+
+from app.controllers.retention_controller import apply_tracking_retention
+from app.core.config import settings
+from app.crud import crud_tracking
+from app.db.session import AsyncSessionLocal, async_engine
+
+
+async def rebuild_rollups():
+    async with AsyncSessionLocal() as db:
+        await crud_tracking.rebuild_rollups(db)
+    print("[ROLLUP] Rebuilt hourly rollups from tracking rows")
+
+
+async def run(args):
+    try:
+        if args.command == "retention":
+            await apply_tracking_retention(args.days, args.rollup_days, archive=not args.no_archive)
+        else:
+            await rebuild_rollups()
+    finally:
+        await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tracking storage maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    r = sub.add_parser("retention", help="archive and delete old tracking rows and rollups")
+    r.add_argument("--days", type=int, default=settings.TRACKING_RETENTION_DAYS)
+    r.add_argument("--rollup-days", type=int, default=settings.ROLLUP_RETENTION_DAYS)
+    r.add_argument("--no-archive", action="store_true", help="delete without uploading to S3_BUCKET_ARCHIVE")
+
+    sub.add_parser("rebuild-rollups", help="recompute hourly rollups from raw tracking rows")
+
+    args = parser.parse_args()
+    if args.command == "retention" and not args.no_archive and not settings.S3_BUCKET_ARCHIVE:
+        parser.error("S3_BUCKET_ARCHIVE is not set; pass --no-archive to delete old rows without archiving them")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
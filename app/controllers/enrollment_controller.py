@@ -0,0 +1,210 @@
+import csv
+import io
+import json
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Tuple
+
+import ulid
+from PIL import Image
+from sqlalchemy.orm import Session
+
+from app.controllers.face_controller import index_manager, UPLOAD_DIR
+from app.core.config import settings
+from app.core.face_analysis import detect_faces, face_attributes
+from app.core.storage import minio_client
+from app.crud import crud_enrollment, crud_face
+from app.db.session import SessionLocal
+from app.schemas.face import FaceCreate
+
+BULK_DIR = os.path.join(UPLOAD_DIR, "bulk")
+os.makedirs(BULK_DIR, exist_ok=True)
+
+MANIFEST_NAME = "manifest.csv"
+IMAGE_EXTS = {"jpg", "jpeg", "png", "webp"}
+# Column sizes of EnrollmentItem.key and Person.id
+MAX_KEY_LENGTH = 255
+MAX_PERSON_ID_LENGTH = 26
+
+
+class EnrollmentSource:
+    """Images of a bulk enrollment, read from a zip archive or a directory.
+
+    Items are listed by ``manifest.csv`` (columns ``person_id,path``) when present,
+    otherwise by the ``<person_id>/<image>`` folder layout.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.archive = zipfile.ZipFile(path) if zipfile.is_zipfile(path) else None
+        if self.archive is None and not os.path.isdir(path):
+            raise ValueError(f"{path} is neither a zip archive nor a directory")
+
+    def _names(self) -> List[str]:
+        if self.archive is not None:
+            return [n for n in self.archive.namelist() if not n.endswith("/")]
+        names = []
+        for root, _, files in os.walk(self.path):
+            for file in files:
+                names.append(os.path.relpath(os.path.join(root, file), self.path).replace(os.sep, "/"))
+        return names
+
+    def read(self, key: str) -> bytes:
+        if self.archive is not None:
+            return self.archive.read(key)
+        with open(os.path.join(self.path, key), "rb") as f:
+            return f.read()
+
+    def items(self) -> List[Tuple[str, str]]:
+        """(key, person_id) pairs, sorted so that resumed runs see the same order."""
+        names = self._names()
+        if MANIFEST_NAME in names:
+            reader = csv.DictReader(io.StringIO(self.read(MANIFEST_NAME).decode("utf-8")))
+            items = [((row.get("path") or "").strip(), (row.get("person_id") or "").strip())
+                     for row in reader]
+            items = [(key, person_id) for key, person_id in items if key]
+        else:
+            items = [
+                (name, name.split("/")[-2])
+                for name in names
+                if name.count("/") >= 1 and name.rsplit(".", 1)[-1].lower() in IMAGE_EXTS
+            ]
+        return sorted(items)
+
+    def close(self):
+        if self.archive is not None:
+            self.archive.close()
+
+
+def _embed(data: bytes, person_id: str) -> Tuple[Optional[FaceCreate], Optional[bytes], Optional[str]]:
+    """Decode, detect and embed one image. Returns (face, jpeg crop, error)."""
+    try:
+        image = Image.open(io.BytesIO(data)).convert("RGB")
+    except Exception:
+        return None, None, "Failed to process image"
+
+    faces = detect_faces(image)
+    if not faces:
+        return None, None, "No face detected"
+
+    face = faces[0]
+    bbox = face.bbox.astype(int)
+    crop = io.BytesIO()
+    image.crop((bbox[0], bbox[1], bbox[2], bbox[3])).save(crop, format="JPEG")
+
+    filename = f"{ulid.new()}.jpeg"
+    face_in = FaceCreate(
+        person_id=person_id,
+        embedding=face.embedding.tolist(),
+        photo_path=filename,
+        **face_attributes(face)
+    )
+    return face_in, crop.getvalue(), None
+
+
+def _upload(face_in: FaceCreate, crop: bytes):
+    minio_client.put_object(settings.S3_BUCKET_FACE, face_in.photo_path, io.BytesIO(crop), len(crop),
+                            content_type="image/jpeg")
+
+
+def run_enrollment_job(job_id: str, batch_size: int = 64, workers: Optional[int] = None):
+    """Process a bulk enrollment job, skipping items a previous run already handled.
+
+    Faces and item results are committed per batch; the FAISS index is
+    updated once, after the last batch. An archive uploaded through the API
+    is deleted once its job completes.
+    """
+    db: Session = SessionLocal()
+    source = None
+    job = crud_enrollment.get(db, job_id)
+    if not job:
+        db.close()
+        raise ValueError(f"Enrollment job {job_id} not found")
+
+    try:
+        source = EnrollmentSource(job.source)
+        # Items are stored under their truncated key, which must be unique per job
+        unique, duplicated = {}, set()
+        for key, person_id in source.items():
+            if key[:MAX_KEY_LENGTH] in unique:
+                duplicated.add(key[:MAX_KEY_LENGTH])
+            else:
+                unique[key[:MAX_KEY_LENGTH]] = (key, person_id)
+        all_items = list(unique.values())
+        job = crud_enrollment.set_status(db, job, "running", total=len(all_items))
+
+        done = crud_enrollment.get_done_keys(db, job.id)
+        pending = [(key, person_id) for key, person_id in all_items if key[:MAX_KEY_LENGTH] not in done]
+        valid_ids = list({p for _, p in pending if 0 < len(p) <= MAX_PERSON_ID_LENGTH})
+        known_persons = crud_enrollment.get_existing_person_ids(db, valid_ids) if valid_ids else set()
+        print(f"[ENROLL] Job {job.id}: {len(pending)} of {len(all_items)} items pending")
+
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            for start in range(0, len(pending), batch_size):
+                batch = pending[start:start + batch_size]
+                failures = []
+                for key, person_id in batch:
+                    if key[:MAX_KEY_LENGTH] in duplicated:
+                        failures.append((key[:MAX_KEY_LENGTH], None, "Path listed more than once"))
+                    elif len(key) > MAX_KEY_LENGTH:
+                        failures.append((key[:MAX_KEY_LENGTH], None, "Path too long"))
+                    elif not 0 < len(person_id) <= MAX_PERSON_ID_LENGTH:
+                        failures.append((key, None, "Invalid person id"))
+                    elif person_id not in known_persons:
+                        failures.append((key, person_id, "Person not found"))
+                batch = [(key, person_id) for key, person_id in batch
+                         if key[:MAX_KEY_LENGTH] not in duplicated and len(key) <= MAX_KEY_LENGTH and person_id in known_persons]
+
+                payloads = []
+                for key, person_id in batch:
+                    try:
+                        payloads.append((key, person_id, source.read(key)))
+                    except KeyError:
+                        failures.append((key, person_id, "File not found in source"))
+
+                embedded = list(pool.map(lambda p: _embed(p[2], p[1]), payloads))
+
+                ready = []
+                for (key, person_id, _), (face_in, crop, error) in zip(payloads, embedded):
+                    if error:
+                        failures.append((key, person_id, error))
+                    else:
+                        ready.append((key, face_in, crop))
+
+                uploads = [pool.submit(_upload, face_in, crop) for _, face_in, crop in ready]
+                enrolled = []
+                for (key, face_in, _), upload in zip(ready, uploads):
+                    try:
+                        upload.result()
+                        enrolled.append((key, face_in))
+                    except Exception as e:
+                        failures.append((key, face_in.person_id, f"Upload failed: {e}"))
+
+                job = crud_enrollment.record_batch(db, job, enrolled, failures)
+                print(f"[ENROLL] Job {job.id}: {job.succeeded} enrolled, {job.failed} failed")
+
+        job = crud_enrollment.set_status(db, job, "running")
+        index_manager.refresh()
+        if index_manager.index is None:
+            # No index anywhere yet: build it from every face, including this job's
+            index_manager.build_from_faces(crud_face.get_all(db))
+        else:
+            faces = crud_enrollment.get_enrolled_faces(db, job.id)
+            embeddings = [json.loads(face.embedding) if isinstance(face.embedding, str) else face.embedding for face in faces]
+            index_manager.add_embeddings(embeddings, [face.person_id for face in faces])
+        crud_enrollment.set_status(db, job, "completed")
+    except Exception as e:
+        print(e)
+        db.rollback()
+        crud_enrollment.set_status(db, job, "failed", error=str(e)[:255])
+    finally:
+        if source is not None:
+            source.close()
+        # Uploaded archives are only kept while the job may still be resumed
+        if job.status == "completed" and os.path.dirname(job.source) == os.path.abspath(BULK_DIR):
+            try:
+                os.remove(job.source)
+            except FileNotFoundError:
+                pass
+        db.close()
@@ -2,20 +2,26 @@ import os
 from datetime import datetime, UTC
 from typing import Optional, List
 
-import numpy as np
 import ulid
 from PIL import Image
 from fastapi import UploadFile, HTTPException
-from insightface.app import FaceAnalysis
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
+from app.core.detection_index import DetectionIndexManager, DAY_FORMAT, photo_key
+from app.core.events import event_broker
+from app.core.face_analysis import detect_faces, face_attributes
 from app.core.faiss_manager import FaissIndexManager
-from app.core.storage import minio_client
-from app.crud import crud_face, crud_tracking, crud_person
+from app.core.scheduler import FrameScheduler, Frame
+from app.core.storage import minio_client, remove_prefix
+from app.crud import crud_face, crud_tracking, crud_person, crud_gallery, crud_camera
+from app.db.session import AsyncSessionLocal
+from app.schemas.detection import DetectionSearchResult
 from app.schemas.face import FaceOut, FaceCreate
 from app.schemas.person import PersonOut
-from app.schemas.tracking import TrackingCreate, TrackingMatchOut
+from app.schemas.tracking import TrackingCreate, TrackingMatchOut, TrackingEvent
 
 UPLOAD_DIR = "uploads"
 FACE_DIR = os.path.join(UPLOAD_DIR, "faces")
@@ -25,10 +31,17 @@ CCTV_DIR = os.path.join(UPLOAD_DIR, "cctv")
 for path in [UPLOAD_DIR, FACE_DIR, TEMP_DIR, CCTV_DIR]:
     os.makedirs(path, exist_ok=True)
 
-app_face = FaceAnalysis(name='buffalo_l', providers=['CPUExecutionProvider'])
-app_face.prepare(ctx_id=-1)
-
 index_manager = FaissIndexManager()
+detection_index = DetectionIndexManager(
+    root=settings.DETECTION_INDEX_DIR,
+    pq_m=settings.DETECTION_PQ_M,
+    nprobe=settings.DETECTION_NPROBE,
+    flush_interval=settings.DETECTION_FLUSH_SECONDS,
+    retention_days=settings.DETECTION_RETENTION_DAYS,
+    max_cached_segments=settings.DETECTION_CACHE_SEGMENTS,
+    # Crops in S3_BUCKET_DETECTED are keyed by day and expire with the index
+    on_expire=lambda day: remove_prefix(settings.S3_BUCKET_DETECTED, f"{day}/")
+)
 
 async def create_face_and_embedding(person_id: str, file: UploadFile, db: Session) -> FaceOut:
     """Register a new face for a person, store embedding and save crop."""
@@ -47,11 +60,10 @@ async def create_face_and_embedding(person_id: str, file: UploadFile, db: Sessio
 
     try:
         image = Image.open(image_path).convert("RGB")
-        image_np = np.array(image)
     except Exception:
         raise HTTPException(status_code=400, detail="Failed to process image")
 
-    faces = app_face.get(image_np)
+    faces = await run_in_threadpool(detect_faces, image)
     if not faces:
         raise HTTPException(status_code=400, detail="No face detected")
 
@@ -65,22 +77,36 @@ async def create_face_and_embedding(person_id: str, file: UploadFile, db: Sessio
         person_id=person_id,
         embedding=embedding,
         photo_path=filename,
-        is_male=face.gender,
-        age=face.age
+        **face_attributes(face)
     )
     face_db = crud_face.create(db, face_record)
     minio_client.fput_object(settings.S3_BUCKET_FACE, filename, face_path)
-    index_manager.add_embedding(embedding, person_id)
+    await run_in_threadpool(index_manager.add_embedding, embedding, person_id)
     os.remove(image_path)
     os.remove(face_path)
     return face_db
 
-async def track_faces_and_embeddings(file: UploadFile, db: Session) -> List[TrackingMatchOut]:
+async def resolve_search_scope(db: AsyncSession, gallery_id: Optional[str] = None, camera_id: Optional[str] = None) -> Optional[set[str]]:
+    """Person ids to search, or None for the whole index.
+
+    An explicit gallery wins over the galleries bound to the camera.
+    """
+    if gallery_id:
+        if not await crud_gallery.get(db, gallery_id):
+            raise HTTPException(status_code=404, detail="Gallery not found")
+        return await crud_gallery.get_person_ids(db, [gallery_id])
+    if camera_id:
+        return await crud_gallery.get_person_ids_for_camera(db, camera_id)
+    return None
+
+async def track_faces_and_embeddings(file: UploadFile, db: AsyncSession, gallery_id: Optional[str] = None) -> List[TrackingMatchOut]:
     """Detect all faces and track each by comparing against the index."""
     ext = file.filename.rsplit(".", 1)[-1].lower()
     if ext not in {"jpg", "jpeg", "png", "webp"}:
         raise HTTPException(status_code=400, detail="Unsupported file type")
 
+    person_ids = await resolve_search_scope(db, gallery_id=gallery_id)
+
     case_id = str(ulid.new())
     filename = f"{case_id}.{ext}"
     temp_path = os.path.join(TEMP_DIR, filename)
@@ -90,12 +116,11 @@ async def track_faces_and_embeddings(file: UploadFile, db: Session) -> List[Trac
 
     try:
         image = Image.open(temp_path).convert("RGB")
-        image_np = np.array(image)
     except Exception:
         os.remove(temp_path)
         raise HTTPException(status_code=400, detail="Failed to process image")
 
-    faces = app_face.get(image_np)
+    faces = await run_in_threadpool(detect_faces, image)
     if not faces:
         os.remove(temp_path)
         raise HTTPException(status_code=400, detail="No face detected")
@@ -107,19 +132,19 @@ async def track_faces_and_embeddings(file: UploadFile, db: Session) -> List[Trac
         cropped_face = image.crop((bbox[0], bbox[1], bbox[2], bbox[3]))
 
         # Save each face with unique filename
-        face_filename = f"{case_id}_face_{i}.{ext}"
-        face_path = os.path.join(TEMP_DIR, face_filename)
+        face_filename = f"{datetime.now().strftime(DAY_FORMAT)}/{case_id}_face_{i}.{ext}"
+        face_path = os.path.join(TEMP_DIR, f"{case_id}_face_{i}.{ext}")
         cropped_face.save(face_path)
 
         embedding = face.embedding.tolist()
-        result = index_manager.search(embedding, top_k=10)
+        result = await run_in_threadpool(index_manager.search, embedding, top_k=10, person_ids=person_ids)
 
         if not result.matches:
             os.remove(face_path)
             continue  # skip unmatched faces, optionally log or collect
 
         match = result.matches[0]
-        person = crud_person.get(db, match.person_id)
+        person = await crud_person.get(db, match.person_id)
 
         match_out = TrackingMatchOut(
             id=f"{case_id}_face_{i}",
@@ -131,7 +156,14 @@ async def track_faces_and_embeddings(file: UploadFile, db: Session) -> List[Trac
             person=PersonOut.model_validate(person)
         )
         results.append(match_out)
-        minio_client.fput_object(settings.S3_BUCKET_DETECTED, face_filename, face_path)
+        await event_broker.publish(TrackingEvent(
+            id=match_out.id,
+            person_id=match.person_id,
+            similarity=match.similarity,
+            photo=face_filename,
+            timestamp=match_out.timestamp
+        ).model_dump(mode="json"))
+        await run_in_threadpool(minio_client.fput_object, settings.S3_BUCKET_DETECTED, face_filename, face_path)
         os.remove(face_path)
 
     os.remove(temp_path)
@@ -141,53 +173,116 @@ async def track_faces_and_embeddings(file: UploadFile, db: Session) -> List[Trac
 
     return results
 
-def process_faces_from_image(file_path: str, camera_id: Optional[str], db: Session):
-    try:
-        image = Image.open(file_path).convert("RGB")
-        image_np = np.array(image)
-    except Exception as e:
-        print(e)
-        return
+def _match_and_store_face(image: Image.Image, face, camera_id: Optional[str], person_ids: Optional[set[str]]):
+    """Crop, search, upload and record one CCTV face. Blocking; run it in the threadpool.
 
-    faces = app_face.get(image_np)
-    if not faces:
-        print("❌ No face found")
-        return
-    print(f"😀 {len(faces)} Faces found ")
-
-    for face in faces:
-        try:
-            bbox = face.bbox.astype(int)
-            cropped_face = image.crop((bbox[0], bbox[1], bbox[2], bbox[3]))
-
-            face_id = str(ulid.new())
-            cropped_filename = f"{face_id}.jpg"
-            cropped_path = os.path.join(TEMP_DIR, cropped_filename)
-            cropped_face.save(cropped_path)
+    Returns (photo filename, search result, best match or None).
+    """
+    bbox = face.bbox.astype(int)
+    timestamp = datetime.now()
+    detection_id = str(ulid.new())
+    cropped_filename = photo_key(detection_id, timestamp)
+    cropped_path = os.path.join(TEMP_DIR, f"{detection_id}.jpg")
+    image.crop((bbox[0], bbox[1], bbox[2], bbox[3])).save(cropped_path)
 
-            face_embedding = face.embedding.tolist()
-            search_result = index_manager.search(face_embedding, top_k=10)
+    face_embedding = face.embedding.tolist()
+    search_result = index_manager.search(face_embedding, top_k=10, person_ids=person_ids)
+    match = search_result.matches[0] if search_result.matches else None
 
-            if not search_result.matches:
-                print("❌ NO FACE MATCH FOUND")
-                os.remove(cropped_path)
-                continue
+    # Every detection is kept for reverse search, matched or not
+    try:
+        minio_client.fput_object(settings.S3_BUCKET_DETECTED, cropped_filename, cropped_path)
+    finally:
+        os.remove(cropped_path)
+    detection_index.add(face_embedding, camera_id, person_id=match.person_id if match else None,
+                        timestamp=timestamp, detection_id=detection_id)
+    return cropped_filename, search_result, match
+
+async def process_faces_from_image(file_path: str, camera_id: Optional[str], gallery_id: Optional[str] = None):
+    """Match every face of a CCTV frame and record a tracking row per match.
+
+    Runs after the response, so it opens its own session. Everything but the
+    awaited database and publish calls runs in the threadpool.
+    """
+    async with AsyncSessionLocal() as db:
+        try:
+            person_ids = await resolve_search_scope(db, gallery_id=gallery_id, camera_id=camera_id)
+        except HTTPException as e:
+            print(e.detail)
+            os.remove(file_path)
+            return
 
-            match = search_result.matches[0]
-            print(f"✅ Match found: {match.person_id}")
-
-            face_data = TrackingCreate(
-                person_id=match.person_id,
-                camera_id=camera_id,
-                photo=cropped_filename,
-                similarity=match.similarity,
-                time_taken=search_result.search_time_ms,
-                index_size=search_result.entries_searched
-            )
-            crud_tracking.create(db, face_data)
-            minio_client.fput_object(settings.S3_BUCKET_DETECTED, cropped_filename, cropped_path)
-            os.remove(cropped_path)
+        try:
+            image = await run_in_threadpool(lambda: Image.open(file_path).convert("RGB"))
         except Exception as e:
             print(e)
-            continue
+            os.remove(file_path)
+            return
+
+        camera = await crud_camera.get(db, camera_id) if camera_id else None
+        if camera:
+            faces = await run_in_threadpool(detect_faces, image, camera.det_size, camera.det_max_side, camera.roi)
+        else:
+            faces = await run_in_threadpool(detect_faces, image)
+        if not faces:
+            print("❌ No face found")
+            os.remove(file_path)
+            return
+        print(f"😀 {len(faces)} Faces found ")
+
+        for face in faces:
+            try:
+                cropped_filename, search_result, match = await run_in_threadpool(
+                    _match_and_store_face, image, face, camera_id, person_ids
+                )
+                if not match:
+                    print("❌ NO FACE MATCH FOUND")
+                    continue
+
+                print(f"✅ Match found: {match.person_id}")
+
+                face_data = TrackingCreate(
+                    person_id=match.person_id,
+                    camera_id=camera_id,
+                    photo=cropped_filename,
+                    similarity=match.similarity,
+                    time_taken=search_result.search_time_ms,
+                    index_size=search_result.entries_searched
+                )
+                tracking = await crud_tracking.create(db, face_data)
+                await event_broker.publish(TrackingEvent.model_validate(tracking).model_dump(mode="json"))
+            except Exception as e:
+                print(e)
+                await db.rollback()
+                continue
     os.remove(file_path)
+
+async def process_frame(frame: Frame):
+    await process_faces_from_image(frame.path, frame.camera_id, frame.gallery_id)
+
+frame_scheduler = FrameScheduler(handler=process_frame)
+
+async def search_detections(file: UploadFile,
+                            start: datetime,
+                            end: datetime,
+                            top_k: int = 50,
+                            threshold: float = 0.5,
+                            camera_id: Optional[str] = None) -> DetectionSearchResult:
+    """Find past appearances of the face in ``file`` across all detections in [start, end]."""
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+
+    try:
+        image = Image.open(file.file).convert("RGB")
+    except Exception:
+        raise HTTPException(status_code=400, detail="Failed to process image")
+
+    faces = await run_in_threadpool(detect_faces, image)
+    if not faces:
+        raise HTTPException(status_code=400, detail="No face detected")
+
+    face = max(faces, key=lambda f: (f.bbox[2] - f.bbox[0]) * (f.bbox[3] - f.bbox[1]))
+    return await run_in_threadpool(
+        detection_index.search, face.embedding.tolist(), start, end,
+        top_k=top_k, threshold=threshold, camera_id=camera_id
+    )
@@ -0,0 +1,79 @@
+import gzip
+import json
+import tempfile
+from datetime import datetime, timedelta
+
+import ulid
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.storage import minio_client
+from app.crud import crud_tracking
+from app.db.session import AsyncSessionLocal
+from app.schemas.tracking import TrackingEvent
+
+
+def _archive_key(day: datetime) -> str:
+    # One object per run, so a rerun never overwrites rows archived earlier
+    return f"tracking/{day:%Y/%m/%d}/{ulid.new()}.jsonl.gz"
+
+
+def _write_lines(archive: gzip.GzipFile, lines: list[str]):
+    archive.write("".join(lines).encode("utf-8"))
+
+
+async def _archive_day(db, day: datetime) -> list[str]:
+    """Upload one day of tracking rows to S3 as gzipped JSON lines. Returns the archived ids.
+
+    Rows are read and compressed page by page into a temporary file, so memory
+    stays bounded however many rows the day holds.
+    """
+    ids: list[str] = []
+    with tempfile.NamedTemporaryFile(suffix=".jsonl.gz") as tmp:
+        with gzip.GzipFile(fileobj=tmp, mode="wb") as archive:
+            async for rows in crud_tracking.iter_range(db, day, day + timedelta(days=1)):
+                lines = []
+                for row in rows:
+                    record = TrackingEvent.model_validate(row).model_dump(mode="json")
+                    record.update(time_taken=row.time_taken, index_size=row.index_size)
+                    lines.append(json.dumps(record) + "\n")
+                    ids.append(row.id)
+                await run_in_threadpool(_write_lines, archive, lines)
+        if not ids:
+            return []
+        tmp.flush()
+        await run_in_threadpool(minio_client.fput_object, settings.S3_BUCKET_ARCHIVE, _archive_key(day),
+                                tmp.name, content_type="application/gzip")
+    return ids
+
+
+async def apply_tracking_retention(retention_days: int = settings.TRACKING_RETENTION_DAYS,
+                                   rollup_retention_days: int = settings.ROLLUP_RETENTION_DAYS,
+                                   archive: bool = True):
+    """Archive and delete raw tracking rows day by day, then drop expired rollups.
+
+    Days are processed oldest first. Each run writes its own archive object per
+    day and deletes only the rows it archived, so an interrupted run can simply
+    be started again. Rows are deleted without archiving only when ``archive``
+    is False; archiving without S3_BUCKET_ARCHIVE configured is an error.
+    """
+    if archive and not settings.S3_BUCKET_ARCHIVE:
+        raise ValueError("S3_BUCKET_ARCHIVE is not set; pass archive=False (--no-archive) to delete without archiving")
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    cutoff = today - timedelta(days=retention_days)
+    async with AsyncSessionLocal() as db:
+        oldest = await crud_tracking.get_oldest_timestamp(db)
+        day = oldest.replace(hour=0, minute=0, second=0, microsecond=0) if oldest else cutoff
+        while day < cutoff:
+            if archive:
+                archived = await _archive_day(db, day)
+                removed = await crud_tracking.remove_ids(db, archived)
+            else:
+                archived = []
+                removed = await crud_tracking.remove_range(db, day, day + timedelta(days=1))
+            if removed:
+                print(f"[RETENTION] {day:%Y-%m-%d}: archived {len(archived)}, deleted {removed} tracking rows")
+            day += timedelta(days=1)
+
+        removed = await crud_tracking.remove_rollups_before(db, today - timedelta(days=rollup_retention_days))
+        print(f"[RETENTION] Deleted {removed} expired rollup rows")
@@ -9,11 +9,62 @@ class Settings:
     JWT_ALGORITHM: str = "HS256"
     REDIS_HOST: str = os.getenv("REDIS_HOST")
     REDIS_MATCHING_QUEUE: str = "FACE_MATCH"
+    REDIS_URL: str = os.getenv("REDIS_URL") or f"redis://{os.getenv('REDIS_HOST') or 'localhost'}:6379/0"
+    REDIS_EVENTS_CHANNEL: str = os.getenv("REDIS_EVENTS_CHANNEL", "TRACKING_EVENTS")
+    # "memory" serves a single worker, "redis" fans out across workers
+    EVENT_BROKER: str = os.getenv("EVENT_BROKER", "memory")
+    EVENT_QUEUE_SIZE: int = int(os.getenv("EVENT_QUEUE_SIZE", "100"))
     DATABASE_URL: str = os.getenv("DATABASE_URL")
+    ASYNC_DATABASE_URL: str = os.getenv("ASYNC_DATABASE_URL") or (DATABASE_URL or "").replace("mysql+pymysql://", "mysql+aiomysql://", 1)
+    # Per worker process, each worker holding both pools: keep
+    # workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW + SYNC_DB_POOL_SIZE + SYNC_DB_MAX_OVERFLOW)
+    # below MySQL max_connections
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "5"))
+    # The sync engine only serves face registration and bulk enrollment
+    SYNC_DB_POOL_SIZE: int = int(os.getenv("SYNC_DB_POOL_SIZE", "2"))
+    SYNC_DB_MAX_OVERFLOW: int = int(os.getenv("SYNC_DB_MAX_OVERFLOW", "2"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_TIMEOUT: int = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+    # A running enrollment job with no progress for this long can be resumed
+    ENROLLMENT_STALE_SECONDS: int = int(os.getenv("ENROLLMENT_STALE_SECONDS", "600"))
     S3_HOST: str = os.getenv("S3_HOST")
     S3_ACCESS_KEY: str = os.getenv("S3_ACCESS_KEY")
     S3_SECRET_KEY: str = os.getenv("S3_SECRET_KEY")
     S3_BUCKET_FACE: str = os.getenv("S3_BUCKET_FACE")
     S3_BUCKET_DETECTED: str = os.getenv("S3_BUCKET_DETECTED")
+    S3_BUCKET_ARCHIVE: str = os.getenv("S3_BUCKET_ARCHIVE")
+    # Raw tracking rows older than this are archived and deleted; rollups are kept longer
+    TRACKING_RETENTION_DAYS: int = int(os.getenv("TRACKING_RETENTION_DAYS", "90"))
+    ROLLUP_RETENTION_DAYS: int = int(os.getenv("ROLLUP_RETENTION_DAYS", "730"))
+    FACE_MODEL_NAME: str = os.getenv("FACE_MODEL_NAME", "buffalo_l")
+    FACE_MODEL_ROOT: str = os.getenv("FACE_MODEL_ROOT", "~/.insightface")
+    # Comma separated insightface tasks to load; empty loads the whole pack
+    FACE_MODEL_MODULES: str = os.getenv("FACE_MODEL_MODULES", "detection,recognition,genderage")
+    FACE_DET_THRESH: float = float(os.getenv("FACE_DET_THRESH", "0.5"))
+    # ONNX Runtime threads per worker process; keep intra * workers <= cores
+    ORT_INTRA_OP_THREADS: int = int(os.getenv("ORT_INTRA_OP_THREADS", max(1, (os.cpu_count() or 1) // int(os.getenv("WEB_CONCURRENCY", "1")))))
+    ORT_INTER_OP_THREADS: int = int(os.getenv("ORT_INTER_OP_THREADS", "1"))
+    # CCTV ingest, per worker process: frames/s and burst per camera, frames queued per camera,
+    # oldest frame age worth processing, and concurrent recognition tasks. Limits are not shared,
+    # so a camera spread over N Gunicorn workers may send up to N * CCTV_RATE_PER_SECOND frames/s.
+    CCTV_RATE_PER_SECOND: float = float(os.getenv("CCTV_RATE_PER_SECOND", "2"))
+    CCTV_BURST: int = int(os.getenv("CCTV_BURST", "4"))
+    CCTV_QUEUE_PER_CAMERA: int = int(os.getenv("CCTV_QUEUE_PER_CAMERA", "2"))
+    CCTV_MAX_LAG_SECONDS: float = float(os.getenv("CCTV_MAX_LAG_SECONDS", "10"))
+    CCTV_WORKERS: int = int(os.getenv("CCTV_WORKERS", "2"))
+    # Per-camera state is dropped after this long without frames
+    CCTV_IDLE_SECONDS: float = float(os.getenv("CCTV_IDLE_SECONDS", "300"))
+    DETECTION_INDEX_DIR: str = os.getenv("DETECTION_INDEX_DIR", "detection_index")
+    DETECTION_RETENTION_DAYS: int = int(os.getenv("DETECTION_RETENTION_DAYS", "180"))
+    # PQ sub-quantizers per 512-d vector; 64 stores each sealed detection in 64 bytes
+    DETECTION_PQ_M: int = int(os.getenv("DETECTION_PQ_M", "64"))
+    # Longest a detection waits in a worker's buffer before other workers can search it
+    DETECTION_FLUSH_SECONDS: float = float(os.getenv("DETECTION_FLUSH_SECONDS", "5"))
+    # IVF lists probed per sealed day; higher is more accurate and slower
+    DETECTION_NPROBE: int = int(os.getenv("DETECTION_NPROBE", "16"))
+    # Segments kept in memory; the default covers every retained day plus today's flat segments
+    DETECTION_CACHE_SEGMENTS: int | None = int(os.getenv("DETECTION_CACHE_SEGMENTS")) if os.getenv("DETECTION_CACHE_SEGMENTS") else None
+    FACE_DET_MAX_SIDE: int | None = int(os.getenv("FACE_DET_MAX_SIDE")) if os.getenv("FACE_DET_MAX_SIDE") else None
 
 settings = Settings()
@@ -0,0 +1,502 @@
+import fcntl
+import math
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, List, Dict, Optional, Tuple
+
+import faiss
+import numpy as np
+import ulid
+
+from app.schemas.detection import DetectionItem, DetectionSearchResult
+
+DAY_FORMAT = "%Y%m%d"
+FLAT_SUFFIX = ".flat"
+SEALED_SUFFIX = ".sealed"
+COLUMNS = ("ids", "timestamps", "cameras", "camera_codes", "persons", "person_codes")
+
+
+def photo_key(detection_id: str, timestamp: datetime) -> str:
+    """Object key of a detection's crop, grouped by day so an expired day is deleted by prefix."""
+    return f"{timestamp.strftime(DAY_FORMAT)}/{detection_id}.jpg"
+
+
+def _encode(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Distinct values and, per row, the int32 code of its value."""
+    table, codes = np.unique(values, return_inverse=True)
+    return table, codes.astype("int32")
+
+
+class _Segment:
+    """A searchable index with one fixed-width column entry per row.
+
+    Camera and person ids are stored as int codes into small per-segment
+    tables ("" for none). Result rows are only materialized for the hits.
+    """
+
+    def __init__(self,
+                 index: faiss.Index,
+                 ids: np.ndarray,
+                 timestamps: np.ndarray,
+                 cameras: np.ndarray,
+                 camera_codes: np.ndarray,
+                 persons: np.ndarray,
+                 person_codes: np.ndarray):
+        self.index = index
+        self.ids = ids
+        self.timestamps = timestamps
+        self.cameras = cameras
+        self.camera_codes = camera_codes
+        self.persons = persons
+        self.person_codes = person_codes
+        self.sorted_by_time = bool(np.all(timestamps[1:] >= timestamps[:-1]))
+
+    @classmethod
+    def from_columns(cls, index: faiss.Index, ids, timestamps, camera_ids, person_ids) -> "_Segment":
+        cameras, camera_codes = _encode(np.asarray(camera_ids, dtype="U"))
+        persons, person_codes = _encode(np.asarray(person_ids, dtype="U"))
+        return cls(index, np.asarray(ids, dtype="S26"), np.asarray(timestamps, dtype="float64"),
+                   cameras, camera_codes, persons, person_codes)
+
+    @classmethod
+    def from_rows(cls, index: faiss.Index, rows: List[Tuple[str, float, str, str]]) -> "_Segment":
+        ids, timestamps, camera_ids, person_ids = zip(*rows) if rows else ((), (), (), ())
+        return cls.from_columns(index, ids, timestamps, camera_ids, person_ids)
+
+    @classmethod
+    def concat(cls, index: faiss.Index, segments: List["_Segment"], order: Optional[np.ndarray] = None) -> "_Segment":
+        """Rows of ``segments`` in sequence, reordered by ``order`` if given."""
+        columns = [
+            np.concatenate([s.ids for s in segments]),
+            np.concatenate([s.timestamps for s in segments]),
+            np.concatenate([s.cameras[s.camera_codes] for s in segments]),
+            np.concatenate([s.persons[s.person_codes] for s in segments]),
+        ]
+        if order is not None:
+            columns = [column[order] for column in columns]
+        return cls.from_columns(index, *columns)
+
+    @classmethod
+    def load(cls, path: str) -> "_Segment":
+        index = faiss.read_index(f"{path}.faiss")
+        with np.load(f"{path}.npz") as data:
+            columns = {name: data[name] for name in COLUMNS}
+        return cls(index, **columns)
+
+    def save(self, path: str):
+        faiss.write_index(self.index, f"{path}.faiss.tmp")
+        with open(f"{path}.npz.tmp", "wb") as f:
+            np.savez(f, **{name: getattr(self, name) for name in COLUMNS})
+        # Readers list segments by their .faiss file, so it goes in last
+        os.replace(f"{path}.npz.tmp", f"{path}.npz")
+        os.replace(f"{path}.faiss.tmp", f"{path}.faiss")
+
+    def vectors(self) -> np.ndarray:
+        return self.index.reconstruct_n(0, self.index.ntotal)
+
+    def item(self, row: int, similarity: float) -> DetectionItem:
+        detection_id = self.ids[row].decode()
+        timestamp = datetime.fromtimestamp(float(self.timestamps[row]))
+        return DetectionItem(
+            id=detection_id,
+            camera_id=str(self.cameras[self.camera_codes[row]]) or None,
+            person_id=str(self.persons[self.person_codes[row]]) or None,
+            photo=photo_key(detection_id, timestamp),
+            timestamp=timestamp,
+            similarity=similarity
+        )
+
+
+class DetectionIndexManager:
+    """Time-bucketed index of every detected face, next to the gallery index.
+
+    Each day is a directory of immutable segments. Writers buffer detections
+    in memory and write them as a new flat segment every ``flush_every``
+    detections or ``flush_interval`` seconds, whichever comes first, so other
+    workers see them quickly. Today's small segments are merged as they pile
+    up; once a day is over its segments are sealed into one segment, an IVF-PQ
+    index sorted by time when the day is large enough to train one. Dropping
+    old data deletes whole day directories, and ``on_expire`` lets the owner
+    delete the day's crops too.
+    """
+
+    def __init__(self,
+                 dim: int = 512,
+                 root: str = "detection_index",
+                 pq_m: int = 64,
+                 nprobe: int = 16,
+                 min_train_size: int = 10000,
+                 flush_every: int = 1000,
+                 flush_interval: float = 5.0,
+                 compact_after: int = 16,
+                 retention_days: int = 180,
+                 max_cached_segments: Optional[int] = None,
+                 on_expire: Optional[Callable[[str], None]] = None):
+        self.dim = dim
+        self.root = root
+        self.pq_m = pq_m
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.compact_after = compact_after
+        self.retention_days = retention_days
+        # One sealed segment per retained day, plus room for today's flat segments
+        self.max_cached_segments = max_cached_segments or retention_days + 2 * compact_after
+        self.on_expire = on_expire
+
+        # Detections of this process not yet on disk: (id, timestamp, camera id, person id)
+        self.day: Optional[str] = None
+        self.buffer: Optional[faiss.Index] = None
+        self.rows: List[Tuple[str, float, str, str]] = []
+        self.buffer_started = 0.0
+        # Segments taken from the buffer and being written, still searched from memory
+        self.writing: Dict[str, _Segment] = {}
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.flusher: Optional[threading.Thread] = None
+
+        # path -> segment read from disk; segment files are never modified
+        self.cache: "OrderedDict[str, _Segment]" = OrderedDict()
+        self.cache_lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def _day_dir(self, day: str) -> str:
+        return os.path.join(self.root, day)
+
+    def _take_buffer(self) -> Optional[Tuple[str, _Segment]]:
+        """Detach the buffer as a segment to write. Call with ``self.lock`` held."""
+        if self.buffer is None or self.buffer.ntotal == 0:
+            return None
+        path = os.path.join(self._day_dir(self.day), f"{ulid.new()}{FLAT_SUFFIX}")
+        segment = _Segment.from_rows(self.buffer, self.rows)
+        self.writing[path] = segment
+        self.buffer = faiss.IndexFlatIP(self.dim)
+        self.rows = []
+        return path, segment
+
+    def _write_segment(self, path: str, segment: _Segment):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        segment.save(path)
+        with self.lock:
+            self.writing.pop(path, None)
+        day = os.path.basename(os.path.dirname(path))
+        if len(self._small_flat_segments(day)) >= self.compact_after:
+            self.start_compaction(days=[day])
+
+    def _segment_paths(self, day: str, suffix: str) -> List[str]:
+        day_dir = self._day_dir(day)
+        return sorted(os.path.join(day_dir, name[:-len(".faiss")])
+                      for name in os.listdir(day_dir) if name.endswith(f"{suffix}.faiss"))
+
+    def _small_flat_segments(self, day: str) -> List[str]:
+        """Flat segments of ``day`` holding fewer than ``flush_every`` vectors."""
+        limit = self.flush_every * self.dim * 4
+        small = []
+        for path in self._segment_paths(day, FLAT_SUFFIX):
+            try:
+                if os.path.getsize(f"{path}.faiss") < limit:
+                    small.append(path)
+            except FileNotFoundError:
+                pass
+        return small
+
+    def add(self,
+            embedding: List[float],
+            camera_id: Optional[str],
+            person_id: Optional[str] = None,
+            timestamp: Optional[datetime] = None,
+            detection_id: Optional[str] = None) -> str:
+        """Record one detection. Returns its id.
+
+        Writes a segment file every ``flush_every`` calls, so call it from a
+        worker thread rather than the event loop.
+        """
+        timestamp = timestamp or datetime.now()
+        day = timestamp.strftime(DAY_FORMAT)
+        detection_id = detection_id or str(ulid.new())
+
+        emb = np.array([embedding], dtype="float32")
+        faiss.normalize_L2(emb)
+
+        finished = None
+        with self.lock:
+            if day != self.day:
+                finished = self._take_buffer()
+                self.day = day
+                self.buffer = faiss.IndexFlatIP(self.dim)
+                self.rows = []
+            if not self.rows:
+                self.buffer_started = time.monotonic()
+            self.buffer.add(emb)
+            self.rows.append((detection_id, timestamp.timestamp(), camera_id or "", person_id or ""))
+            full = self._take_buffer() if self.buffer.ntotal >= self.flush_every else None
+
+        if finished is not None:
+            # The day is over for this process: write its tail, then seal and expire
+            self._write_segment(*finished)
+            self.start_compaction()
+        if full is not None:
+            self._write_segment(*full)
+        return detection_id
+
+    def flush(self, older_than: float = 0.0):
+        """Write buffered detections, if the oldest has waited at least ``older_than`` seconds."""
+        with self.lock:
+            if not self.rows or time.monotonic() - self.buffer_started < older_than:
+                return
+            pending = self._take_buffer()
+        if pending is not None:
+            self._write_segment(*pending)
+
+    def _flush_periodically(self):
+        while not self.stopped.wait(self.flush_interval):
+            try:
+                self.flush(older_than=self.flush_interval)
+            except Exception as e:
+                print(f"[DETECTIONS] Periodic flush failed: {e}")
+
+    def start(self):
+        """Start the periodic flush and seal days left over by a previous run."""
+        self.stopped.clear()
+        self.flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+        self.flusher.start()
+        self.start_compaction()
+
+    def stop(self):
+        self.stopped.set()
+        if self.flusher is not None:
+            self.flusher.join()
+        self.flush()
+
+    def start_compaction(self, days: Optional[List[str]] = None) -> threading.Thread:
+        thread = threading.Thread(target=self.seal_and_expire, args=(days,), daemon=True)
+        thread.start()
+        return thread
+
+    def _build_sealed(self, vectors: np.ndarray) -> faiss.Index:
+        """IVF-PQ over ``vectors``, or a flat index when there are too few to train it."""
+        n = len(vectors)
+        if n < self.min_train_size:
+            index = faiss.IndexFlatIP(self.dim)
+            index.add(vectors)
+            return index
+        nlist = max(1, min(int(4 * math.sqrt(n)), n // 39))
+        quantizer = faiss.IndexFlatIP(self.dim)
+        index = faiss.IndexIVFPQ(quantizer, self.dim, nlist, self.pq_m, 8, faiss.METRIC_INNER_PRODUCT)
+        sample_size = min(n, max(nlist * 64, self.min_train_size))
+        sample = vectors[np.random.default_rng(0).choice(n, sample_size, replace=False)]
+        index.train(sample)
+        index.add(vectors)
+        return index
+
+    @staticmethod
+    def _remove_segments(paths: List[str]):
+        for path in paths:
+            for ext in (".faiss", ".npz"):
+                try:
+                    os.remove(f"{path}{ext}")
+                except FileNotFoundError:
+                    pass
+
+    def _merge_small(self, day: str):
+        """Merge today's small flat segments into one, so each vector is rewritten only a few times."""
+        paths = self._small_flat_segments(day)
+        if len(paths) < self.compact_after:
+            return
+        segments = [_Segment.load(path) for path in paths]
+        index = faiss.IndexFlatIP(self.dim)
+        index.add(np.vstack([segment.vectors() for segment in segments]))
+        _Segment.concat(index, segments).save(os.path.join(self._day_dir(day), f"{ulid.new()}{FLAT_SUFFIX}"))
+        self._remove_segments(paths)
+        print(f"[DETECTIONS] Merged {len(paths)} segments of {day} ({index.ntotal} vectors)")
+
+    def _seal(self, day: str):
+        """Merge the flat segments of a finished ``day`` into its sealed segment."""
+        flat_paths = self._segment_paths(day, FLAT_SUFFIX)
+        if not flat_paths:
+            return
+        sealed_paths = self._segment_paths(day, SEALED_SUFFIX)
+        sealed = _Segment.load(sealed_paths[-1]) if sealed_paths else None
+
+        flats = [_Segment.load(path) for path in flat_paths]
+        new = _Segment.concat(None, flats)
+        order = np.argsort(new.timestamps, kind="stable")
+        vectors = np.vstack([segment.vectors() for segment in flats])[order]
+        new = _Segment.concat(None, [new], order)
+
+        if sealed is not None and isinstance(sealed.index, faiss.IndexIVF):
+            # Already trained: append the late arrivals
+            sealed.index.add(vectors)
+            merged = _Segment.concat(sealed.index, [sealed, new])
+        else:
+            parts = [sealed, new] if sealed is not None else [new]
+            if sealed is not None:
+                vectors = np.vstack([sealed.vectors(), vectors])
+            merged = _Segment.concat(None, parts)
+            order = np.argsort(merged.timestamps, kind="stable")
+            merged = _Segment.concat(self._build_sealed(vectors[order]), [merged], order)
+
+        merged.save(os.path.join(self._day_dir(day), f"{ulid.new()}{SEALED_SUFFIX}"))
+        self._remove_segments(sealed_paths + flat_paths)
+        print(f"[DETECTIONS] Sealed {day}: {merged.index.ntotal} vectors from {len(flat_paths)} segments")
+
+    def _compact_day(self, day: str, today: str):
+        day_dir = self._day_dir(day)
+        with open(os.path.join(day_dir, ".compact.lock"), "w") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return  # Another process is compacting this day
+            if day < today:
+                self._seal(day)
+            else:
+                self._merge_small(day)
+
+    def seal_and_expire(self, days: Optional[List[str]] = None):
+        """Compact segments and delete days beyond retention.
+
+        ``days`` limits compaction to those days; by default every day before
+        today is sealed. Flat segments that arrive for an already sealed day
+        are merged into it on the next run.
+        """
+        now = datetime.now()
+        oldest = (now - timedelta(days=self.retention_days)).strftime(DAY_FORMAT)
+        today = now.strftime(DAY_FORMAT)
+
+        for day in sorted(os.listdir(self.root)):
+            if not os.path.isdir(self._day_dir(day)):
+                continue
+            if day < oldest:
+                try:
+                    if self.on_expire is not None:
+                        self.on_expire(day)
+                except Exception as e:
+                    # Keep the index so the crops are retried on the next run
+                    print(f"[DETECTIONS] Failed to expire {day}: {e}")
+                    continue
+                shutil.rmtree(self._day_dir(day), ignore_errors=True)
+                print(f"[DETECTIONS] Dropped bucket {day}")
+            elif (days is None and day < today) or (days is not None and day in days):
+                try:
+                    self._compact_day(day, today)
+                except Exception as e:
+                    print(f"[DETECTIONS] Failed to compact {day}: {e}")
+
+    def _segment(self, path: str) -> Optional[_Segment]:
+        """Read a segment from disk, reusing the cached copy."""
+        with self.cache_lock:
+            segment = self.cache.get(path)
+            if segment is not None:
+                self.cache.move_to_end(path)
+                return segment
+        try:
+            segment = _Segment.load(path)
+        except (FileNotFoundError, RuntimeError):
+            return None  # Removed by a compaction since it was listed
+        with self.cache_lock:
+            self.cache[path] = segment
+            if len(self.cache) > self.max_cached_segments:
+                self.cache.popitem(last=False)
+        return segment
+
+    def _segments(self, start: datetime, end: datetime):
+        """Yield every on-disk or in-flight segment whose day overlaps [start, end]."""
+        first, last = start.strftime(DAY_FORMAT), end.strftime(DAY_FORMAT)
+        with self.lock:
+            writing = dict(self.writing)
+        for path, segment in writing.items():
+            if first <= os.path.basename(os.path.dirname(path)) <= last:
+                yield segment
+
+        day = start.replace(hour=0, minute=0, second=0, microsecond=0)
+        while day <= end:
+            day_dir = self._day_dir(day.strftime(DAY_FORMAT))
+            if os.path.isdir(day_dir):
+                for name in os.listdir(day_dir):
+                    path = os.path.join(day_dir, name[:-len(".faiss")])
+                    if not name.endswith(".faiss") or path in writing:
+                        continue
+                    segment = self._segment(path)
+                    if segment is not None:
+                        yield segment
+            day += timedelta(days=1)
+
+    def _search_segment(self,
+                        segment: _Segment,
+                        query: np.ndarray,
+                        start_ts: float,
+                        end_ts: float,
+                        top_k: int,
+                        camera_id: Optional[str]) -> Tuple[int, List[Tuple[float, _Segment, int]]]:
+        """Search only the rows of ``segment`` inside the time range and camera.
+
+        Returns (rows considered, [(score, segment, row)]).
+        """
+        timestamps = segment.timestamps
+        if segment.sorted_by_time and camera_id is None:
+            lo = int(np.searchsorted(timestamps, start_ts, side="left"))
+            hi = int(np.searchsorted(timestamps, end_ts, side="right"))
+            count = hi - lo
+            selector = faiss.IDSelectorRange(lo, hi) if count < len(timestamps) else None
+        else:
+            mask = (timestamps >= start_ts) & (timestamps <= end_ts)
+            if camera_id is not None:
+                code = np.flatnonzero(segment.cameras == camera_id)
+                if len(code) == 0:
+                    return 0, []
+                mask &= segment.camera_codes == code[0]
+            ids = np.flatnonzero(mask).astype("int64")
+            count = len(ids)
+            selector = faiss.IDSelectorBatch(count, faiss.swig_ptr(ids)) if count < len(timestamps) else None
+        if count == 0:
+            return 0, []
+
+        if isinstance(segment.index, faiss.IndexIVF):
+            params = faiss.SearchParametersIVF(sel=selector, nprobe=self.nprobe) if selector else \
+                faiss.SearchParametersIVF(nprobe=self.nprobe)
+        else:
+            params = faiss.SearchParameters(sel=selector) if selector else None
+        scores, indices = segment.index.search(query, min(top_k, count), params=params)
+        return count, [(float(score), segment, int(idx))
+                       for idx, score in zip(indices[0], scores[0]) if 0 <= idx < len(timestamps)]
+
+    def search(self,
+               query_embedding: List[float],
+               start: datetime,
+               end: datetime,
+               top_k: int = 50,
+               threshold: float = 0.5,
+               camera_id: Optional[str] = None) -> DetectionSearchResult:
+        """Rank past detections similar to the query within [start, end]."""
+        start_time = time.time()
+        query = np.array([query_embedding], dtype="float32")
+        faiss.normalize_L2(query)
+        start_ts, end_ts = start.timestamp(), end.timestamp()
+
+        hits: List[Tuple[float, _Segment, int]] = []
+        searched = 0
+        segments = list(self._segments(start, end))
+        with self.lock:
+            # The live buffer is searched under the lock, since adds mutate it
+            if self.rows and start.strftime(DAY_FORMAT) <= self.day <= end.strftime(DAY_FORMAT):
+                count, found = self._search_segment(_Segment.from_rows(self.buffer, self.rows), query,
+                                                    start_ts, end_ts, top_k, camera_id)
+                searched += count
+                hits += found
+        for segment in segments:
+            count, found = self._search_segment(segment, query, start_ts, end_ts, top_k, camera_id)
+            searched += count
+            hits += found
+
+        hits = [hit for hit in hits if math.isfinite(hit[0]) and hit[0] >= threshold]
+        hits.sort(key=lambda hit: hit[0], reverse=True)
+        return DetectionSearchResult(
+            matches=[segment.item(row, float(f"{min(score, 1.0):.2f}")) for score, segment, row in hits[:top_k]],
+            search_time_ms=int((time.time() - start_time) * 1000),
+            entries_searched=searched
+        )
@@ -0,0 +1,92 @@
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Set
+
+from app.core.config import settings
+
+
+class EventBroker:
+    """In-process fan-out of tracking events to stream subscribers.
+
+    Each subscriber gets a bounded queue; when a slow client falls behind, its
+    oldest events are dropped instead of blocking publishers. Publishing never
+    raises, so callers need not guard it.
+    """
+
+    def __init__(self, queue_size: int = settings.EVENT_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.subscribers: Set[asyncio.Queue] = set()
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def publish(self, event: dict):
+        self.dispatch(event)
+
+    def dispatch(self, event: dict):
+        for queue in self.subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    @asynccontextmanager
+    async def subscribe(self) -> AsyncIterator[asyncio.Queue]:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self.subscribers.add(queue)
+        try:
+            yield queue
+        finally:
+            self.subscribers.discard(queue)
+
+
+class RedisEventBroker(EventBroker):
+    """Fans events out across Gunicorn workers through Redis pub/sub."""
+
+    def __init__(self, url: str, channel: str, queue_size: int = settings.EVENT_QUEUE_SIZE):
+        super().__init__(queue_size)
+        import redis.asyncio as redis
+        self.redis = redis.from_url(url)
+        self.channel = channel
+        self.listener: asyncio.Task | None = None
+
+    async def start(self):
+        self.listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self.listener:
+            self.listener.cancel()
+        await self.redis.aclose()
+
+    async def publish(self, event: dict):
+        # Best effort: a broker outage must not fail the recognition that produced the event
+        try:
+            await self.redis.publish(self.channel, json.dumps(event))
+        except Exception as e:
+            print(f"[EVENTS] Failed to publish event: {e}")
+
+    async def _listen(self):
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self.dispatch(json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[EVENTS] Redis listener error: {e}")
+                await asyncio.sleep(1)
+
+
+def create_broker() -> EventBroker:
+    if settings.EVENT_BROKER == "redis":
+        return RedisEventBroker(settings.REDIS_URL, settings.REDIS_EVENTS_CHANNEL)
+    return EventBroker()
+
+
+event_broker = create_broker()
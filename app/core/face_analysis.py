@@ -0,0 +1,65 @@
+from typing import Optional, List, Sequence
+
+import numpy as np
+from PIL import Image
+from insightface.app.common import Face
+
+from app.core.config import settings
+from app.core.model_pack import load_face_analysis
+
+app_face = load_face_analysis()
+
+
+def face_attributes(face: Face) -> dict:
+    """Gender and age of a face, or None when the genderage model is not loaded."""
+    return {
+        "is_male": bool(face.gender) if face.get("gender") is not None else None,
+        "age": int(face.age) if face.get("age") is not None else None,
+    }
+
+
+def detect_faces(image: Image.Image,
+                 det_size: Optional[int] = None,
+                 max_side: Optional[int] = None,
+                 roi: Optional[Sequence[float]] = None) -> List[Face]:
+    """Detect and analyse faces in an RGB image.
+
+    Detection runs on the ``roi`` region (fractions ``[x1, y1, x2, y2]`` of the
+    frame), downscaled so its longest side is at most ``max_side``, with a
+    ``det_size`` x ``det_size`` detector input. Alignment, embedding and the
+    other models still run on the full-resolution image.
+    """
+    max_side = max_side or settings.FACE_DET_MAX_SIDE
+    image_np = np.array(image)
+    if not det_size and not max_side and not roi:
+        return app_face.get(image_np)
+
+    offset_x, offset_y = 0, 0
+    region = image
+    if roi:
+        width, height = image.size
+        offset_x, offset_y = int(roi[0] * width), int(roi[1] * height)
+        region = image.crop((offset_x, offset_y, int(roi[2] * width), int(roi[3] * height)))
+
+    scale = 1.0
+    if max_side and max(region.size) > max_side:
+        scale = max_side / max(region.size)
+        region = region.resize((max(1, round(region.width * scale)), max(1, round(region.height * scale))),
+                               Image.BILINEAR)
+
+    input_size = (det_size, det_size) if det_size else None
+    bboxes, kpss = app_face.det_model.detect(np.array(region), input_size=input_size, max_num=0, metric='default')
+    if bboxes.shape[0] == 0:
+        return []
+
+    faces = []
+    for i in range(bboxes.shape[0]):
+        bbox = bboxes[i, 0:4] / scale + np.array([offset_x, offset_y, offset_x, offset_y])
+        kps = kpss[i] / scale + np.array([offset_x, offset_y]) if kpss is not None else None
+        face = Face(bbox=bbox, kps=kps, det_score=bboxes[i, 4])
+        for taskname, model in app_face.models.items():
+            if taskname == 'detection':
+                continue
+            model.get(image_np, face)
+        faces.append(face)
+    return faces
@@ -1,8 +1,11 @@
+import fcntl
 import json
 import math
 import os
+import threading
 import time
-from typing import List, Dict
+from contextlib import contextmanager
+from typing import List, Dict, Iterable, Optional
 
 import faiss
 import numpy as np
@@ -20,6 +23,13 @@ class FaissIndexManager:
         self.metadata_path = metadata_path
         self.index = None
         self.metadata: List[Dict] = []
+        # person_id -> positions in the global index
+        self.positions: Dict[str, List[int]] = {}
+        # Index files are shared by every worker and the CLI: writers hold an
+        # exclusive file lock and reload first, readers reload when the file changes
+        self.lock = threading.RLock()
+        self.lock_path = f"{index_path}.lock"
+        self.loaded_mtime: Optional[float] = None
 
         if self.files_exist():
             self.load()
@@ -30,6 +40,33 @@ class FaissIndexManager:
     def files_exist(self) -> bool:
         return os.path.exists(self.index_path) and os.path.exists(self.metadata_path)
 
+    @contextmanager
+    def _file_lock(self, exclusive: bool = True):
+        with self.lock, open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _file_mtime(self) -> Optional[float]:
+        try:
+            return os.path.getmtime(self.metadata_path)
+        except FileNotFoundError:
+            return None
+
+    def _reload_if_changed(self):
+        mtime = self._file_mtime()
+        if mtime is not None and mtime != self.loaded_mtime and os.path.exists(self.index_path):
+            self.load()
+            print(f"[FAISS] Reloaded index with {self.index.ntotal} vectors.")
+
+    def refresh(self):
+        """Pick up index changes written by other processes."""
+        if self._file_mtime() != self.loaded_mtime:
+            with self._file_lock(exclusive=False):
+                self._reload_if_changed()
+
     def build(self, embeddings: List[List[float]], metadata: List[Dict]):
         """Build the FAISS index from provided embeddings and metadata."""
         if not embeddings or not metadata:
@@ -38,47 +75,121 @@ class FaissIndexManager:
         arr = np.array(embeddings, dtype="float32")
         faiss.normalize_L2(arr)
 
-        self.index = faiss.IndexFlatIP(self.dim)
-        self.index.add(arr)
-        self.metadata = metadata
-        self.save()
+        with self._file_lock():
+            index = faiss.IndexFlatIP(self.dim)
+            index.add(arr)
+            self.index, self.metadata = index, metadata
+            self._rebuild_positions()
+            self.save()
         print(f"[FAISS] Built index with {len(embeddings)} entries.")
 
+    def build_from_faces(self, faces) -> int:
+        """Build the index from ``Face`` rows. Returns the number of embeddings indexed."""
+        embeddings = []
+        metadata = []
+        for face in faces:
+            if not face.embedding or not face.person_id:
+                continue
+            emb = face.embedding
+            if isinstance(emb, str):
+                try:
+                    emb = json.loads(emb)
+                except json.JSONDecodeError:
+                    continue
+            if isinstance(emb, list) and len(emb) == self.dim:
+                embeddings.append(emb)
+                metadata.append({"person_id": face.person_id})
+        if embeddings:
+            self.build(embeddings, metadata)
+        return len(embeddings)
+
     def save(self):
         if self.index is None:
             raise RuntimeError("No index to save.")
-        faiss.write_index(self.index, self.index_path)
-        with open(self.metadata_path, "w") as f:
+        faiss.write_index(self.index, f"{self.index_path}.tmp")
+        with open(f"{self.metadata_path}.tmp", "w") as f:
             json.dump(self.metadata, f, indent=2)
+        os.replace(f"{self.index_path}.tmp", self.index_path)
+        os.replace(f"{self.metadata_path}.tmp", self.metadata_path)
+        self.loaded_mtime = self._file_mtime()
 
     def load(self):
-        self.index = faiss.read_index(self.index_path)
+        mtime = self._file_mtime()
+        index = faiss.read_index(self.index_path)
         with open(self.metadata_path, "r") as f:
-            self.metadata = json.load(f)
+            metadata = json.load(f)
+        with self.lock:
+            self.index, self.metadata = index, metadata
+            self._rebuild_positions()
+        self.loaded_mtime = mtime
 
     def reset(self):
-        self.index = faiss.IndexFlatIP(self.dim)
-        self.metadata = []
-        self.save()
+        with self._file_lock():
+            self.index = faiss.IndexFlatIP(self.dim)
+            self.metadata = []
+            self._rebuild_positions()
+            self.save()
         print("[FAISS] Index reset complete.")
 
     def add_embedding(self, embedding: List[float], person_id: str):
         """Add a new embedding to the index."""
-        if self.index is None:
-            raise RuntimeError("Index is not initialized. Call build() first.")
-        emb = np.array([embedding], dtype="float32")
-        faiss.normalize_L2(emb)
-        self.index.add(emb)
-        self.metadata.append({"person_id": person_id})
-        self.save()
-        print(f"[FAISS] Added embedding for person_id={person_id} New size {self.index.ntotal}")
+        self.add_embeddings([embedding], [person_id])
+
+    def add_embeddings(self, embeddings: List[List[float]], person_ids: List[str]):
+        """Add many embeddings and save the index once."""
+        if not embeddings:
+            return
+        if len(embeddings) != len(person_ids):
+            raise ValueError("Embeddings and person_ids must have the same length.")
+        arr = np.array(embeddings, dtype="float32")
+        faiss.normalize_L2(arr)
+
+        with self._file_lock():
+            # Another process may have written the index since we loaded it
+            self._reload_if_changed()
+            if self.index is None:
+                raise RuntimeError("Index is not initialized. Call build() first.")
+            # Copy on write: searches keep reading the published index while this one grows
+            index = faiss.clone_index(self.index)
+            start = index.ntotal
+            index.add(arr)
+            metadata = self.metadata + [{"person_id": person_id} for person_id in person_ids]
+            positions = {person_id: list(p) for person_id, p in self.positions.items()}
+            for offset, person_id in enumerate(person_ids):
+                positions.setdefault(person_id, []).append(start + offset)
+            self.index, self.metadata, self.positions = index, metadata, positions
+            self.save()
+        print(f"[FAISS] Added {len(embeddings)} embeddings. New size {self.index.ntotal}")
+
+    def _rebuild_positions(self):
+        positions: Dict[str, List[int]] = {}
+        for position, meta in enumerate(self.metadata):
+            positions.setdefault(meta.get("person_id"), []).append(position)
+        self.positions = positions
+
+    @staticmethod
+    def _scope_positions(positions: Dict[str, List[int]], person_ids: Iterable[str]) -> np.ndarray:
+        """Positions in the global index of the given persons' embeddings."""
+        return np.array(
+            sorted(p for person_id in set(person_ids) for p in positions.get(person_id, [])),
+            dtype="int64"
+        )
 
     def search(self,
                query_embedding: List[float],
                top_k: int = 5,
-               threshold: float = 0.6) -> FaissSearchResult:
-        """Search the index for similar embeddings."""
-        if self.index is None or self.index.ntotal == 0:
+               threshold: float = 0.6,
+               person_ids: Optional[Iterable[str]] = None) -> FaissSearchResult:
+        """Search the index for similar embeddings.
+
+        When ``person_ids`` is given, only embeddings of those persons are searched.
+        """
+        self.refresh()
+        # Published indexes are never modified, only replaced, so a consistent
+        # snapshot can be searched without holding the lock
+        with self.lock:
+            index, metadata, positions = self.index, self.metadata, self.positions
+        if index is None or index.ntotal == 0:
             return FaissSearchResult(
                 matches=[],
                 search_time_ms=0,
@@ -87,17 +198,30 @@ class FaissIndexManager:
 
         start_time = time.time()
 
+        searched, params = index.ntotal, None
+        if person_ids is not None:
+            # Only the in-scope rows of the global index are scored
+            scope = self._scope_positions(positions, person_ids)
+            searched = len(scope)
+            if searched == 0:
+                return FaissSearchResult(
+                    matches=[],
+                    search_time_ms=int((time.time() - start_time) * 1000),
+                    entries_searched=0
+                )
+            params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(searched, faiss.swig_ptr(scope)))
+
         query = np.array([query_embedding], dtype="float32")
         faiss.normalize_L2(query)
-        scores, indices = self.index.search(query, top_k)
+        scores, indices = index.search(query, min(top_k, searched), params=params)
 
         matches: List[ResultItem] = []
         for idx, score in zip(indices[0], scores[0]):
-            if not math.isfinite(score) or score < 0:
+            if idx < 0 or not math.isfinite(score) or score < 0:
                 continue
             similarity = float(f"{min(max(score, 0.0), 1.0):.2f}")
-            if idx < len(self.metadata) and similarity >= threshold:
-                person_id = self.metadata[idx].get("person_id")
+            if idx < len(metadata) and similarity >= threshold:
+                person_id = metadata[idx].get("person_id")
                 matches.append(ResultItem(person_id=person_id, similarity=similarity))
 
         elapsed_ms = int((time.time() - start_time) * 1000)
@@ -105,5 +229,5 @@ class FaissIndexManager:
         return FaissSearchResult(
             matches=matches,
             search_time_ms=elapsed_ms,
-            entries_searched=self.index.ntotal
+            entries_searched=searched
         )
@@ -0,0 +1,52 @@
+import os
+from typing import Optional, List
+
+import onnxruntime
+from insightface.app import FaceAnalysis
+
+from app.core.config import settings
+
+
+def session_options() -> onnxruntime.SessionOptions:
+    """ONNX Runtime options with explicit per-worker thread counts."""
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = settings.ORT_INTRA_OP_THREADS
+    options.inter_op_num_threads = settings.ORT_INTER_OP_THREADS
+    options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return options
+
+
+def model_modules(modules: Optional[str] = None) -> Optional[List[str]]:
+    modules = settings.FACE_MODEL_MODULES if modules is None else modules
+    names = [m.strip() for m in modules.split(",") if m.strip()]
+    return names or None
+
+
+def model_pack_dir(name: str, root: Optional[str] = None) -> str:
+    return os.path.join(os.path.expanduser(root or settings.FACE_MODEL_ROOT), "models", name)
+
+
+def load_face_analysis(name: Optional[str] = None,
+                       root: Optional[str] = None,
+                       modules: Optional[str] = None,
+                       det_size: int = 640) -> FaceAnalysis:
+    """Load an insightface model pack, e.g. ``buffalo_l`` or a quantized ``buffalo_l_int8``.
+
+    insightface's model_zoo does not forward session options, so each model's
+    session is recreated here with :func:`session_options`.
+    """
+    app = FaceAnalysis(
+        name=name or settings.FACE_MODEL_NAME,
+        root=os.path.expanduser(root or settings.FACE_MODEL_ROOT),
+        allowed_modules=model_modules(modules),
+        providers=['CPUExecutionProvider']
+    )
+    for task, model in app.models.items():
+        model.session = onnxruntime.InferenceSession(model.model_file, sess_options=session_options(),
+                                                     providers=['CPUExecutionProvider'])
+        options = model.session.get_session_options()
+        print(f"[MODEL] {task}: {os.path.basename(model.model_file)} "
+              f"intra_op_threads={options.intra_op_num_threads} inter_op_threads={options.inter_op_num_threads}")
+    app.prepare(ctx_id=-1, det_thresh=settings.FACE_DET_THRESH, det_size=(det_size, det_size))
+    return app
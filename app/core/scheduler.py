@@ -0,0 +1,173 @@
+import asyncio
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Deque, Dict, Optional
+
+from app.core.config import settings
+
+
+@dataclass
+class Frame:
+    path: str
+    camera_id: Optional[str] = None
+    gallery_id: Optional[str] = None
+    received_at: float = field(default_factory=time.monotonic)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def idle_for(self, now: float) -> float:
+        """Seconds since the bucket was last used, or 0 if it has not refilled yet."""
+        if self.rate > 0 and self.tokens + (now - self.updated) * self.rate < self.capacity:
+            return 0.0
+        return now - self.updated
+
+    def retry_after(self) -> float:
+        return max(0.0, (1 - self.tokens) / self.rate) if self.rate > 0 else 1.0
+
+
+class FrameScheduler:
+    """Admits CCTV frames per camera and feeds them fairly to recognition workers.
+
+    Each camera has a token bucket (``rate`` frames/s, ``burst`` deep) and a
+    queue of at most ``queue_per_camera`` frames; when it overflows the oldest
+    frame is dropped so the newest is kept. Workers take one frame per camera
+    in turn, and skip frames older than ``max_lag`` seconds. Cameras idle for
+    ``idle_after`` seconds are forgotten.
+
+    State is per process: with several workers each one admits ``rate`` frames/s
+    per camera, so the effective limit is ``rate`` times the worker count.
+    """
+
+    def __init__(self,
+                 handler: Callable[[Frame], Awaitable[None]],
+                 rate: float = settings.CCTV_RATE_PER_SECOND,
+                 burst: int = settings.CCTV_BURST,
+                 queue_per_camera: int = settings.CCTV_QUEUE_PER_CAMERA,
+                 max_lag: float = settings.CCTV_MAX_LAG_SECONDS,
+                 workers: int = settings.CCTV_WORKERS,
+                 idle_after: float = settings.CCTV_IDLE_SECONDS):
+        self.handler = handler
+        self.rate = rate
+        self.burst = burst
+        self.queue_per_camera = queue_per_camera
+        self.max_lag = max_lag
+        self.workers = workers
+        self.idle_after = idle_after
+        self.last_eviction = time.monotonic()
+
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.queues: Dict[str, Deque[Frame]] = {}
+        # Cameras with queued frames, in round-robin order
+        self.ready: Deque[str] = deque()
+        self.available = asyncio.Semaphore(0)
+        self.tasks: list[asyncio.Task] = []
+        self.stats = {"accepted": 0, "rate_limited": 0, "dropped_overflow": 0, "dropped_stale": 0,
+                      "dropped_shutdown": 0, "processed": 0, "failed": 0}
+
+    def _bucket(self, key: str) -> TokenBucket:
+        if key not in self.buckets:
+            self.buckets[key] = TokenBucket(self.rate, self.burst)
+        return self.buckets[key]
+
+    def _evict_idle(self):
+        now = time.monotonic()
+        if now - self.last_eviction < self.idle_after:
+            return
+        self.last_eviction = now
+        for key in [k for k, bucket in self.buckets.items() if bucket.idle_for(now) > self.idle_after]:
+            if self.queues.get(key) or key in self.ready:
+                continue
+            del self.buckets[key]
+            self.queues.pop(key, None)
+
+    def admit(self, camera_id: Optional[str]) -> Optional[float]:
+        """Take a token for the camera. Returns None if admitted, else seconds until the next token."""
+        self._evict_idle()
+        bucket = self._bucket(camera_id or "")
+        if bucket.take():
+            return None
+        self.stats["rate_limited"] += 1
+        return bucket.retry_after()
+
+    def enqueue(self, frame: Frame):
+        key = frame.camera_id or ""
+        queue = self.queues.setdefault(key, deque())
+        queue.append(frame)
+        self.stats["accepted"] += 1
+        if len(queue) > self.queue_per_camera:
+            self._drop(queue.popleft(), "dropped_overflow")
+            return
+        if key not in self.ready:
+            self.ready.append(key)
+        self.available.release()
+
+    def _drop(self, frame: Frame, reason: str):
+        self.stats[reason] += 1
+        try:
+            os.remove(frame.path)
+        except FileNotFoundError:
+            pass
+
+    async def _next(self) -> Frame:
+        while True:
+            await self.available.acquire()
+            key = self.ready.popleft()
+            queue = self.queues[key]
+            frame = queue.popleft()
+            if queue:
+                self.ready.append(key)
+            if time.monotonic() - frame.received_at > self.max_lag:
+                self._drop(frame, "dropped_stale")
+                continue
+            return frame
+
+    async def _work(self):
+        while True:
+            frame = await self._next()
+            try:
+                await self.handler(frame)
+                self.stats["processed"] += 1
+            except Exception as e:
+                print(f"[SCHEDULER] Frame {frame.path} failed: {e}")
+                self.stats["failed"] += 1
+
+    async def start(self):
+        self.tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        for key, queue in self.queues.items():
+            while queue:
+                self._drop(queue.popleft(), "dropped_shutdown")
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        return {
+            **self.stats,
+            "cameras": {
+                key or "unknown": {
+                    "queued": len(queue),
+                    "lag_seconds": round(now - queue[0].received_at, 2) if queue else 0.0,
+                }
+                for key, queue in self.queues.items()
+            },
+        }
@@ -1,4 +1,5 @@
 from minio import Minio
+from minio.deleteobjects import DeleteObject
 
 from app.core.config import settings
 
@@ -7,4 +8,11 @@ minio_client = Minio(
         access_key=settings.S3_ACCESS_KEY,
         secret_key=settings.S3_SECRET_KEY,
         secure=False
-)
\ No newline at end of file
+)
+
+def remove_prefix(bucket: str, prefix: str):
+    """Delete every object of ``bucket`` under ``prefix``."""
+    objects = minio_client.list_objects(bucket, prefix=prefix, recursive=True)
+    errors = list(minio_client.remove_objects(bucket, (DeleteObject(o.object_name) for o in objects)))
+    if errors:
+        raise RuntimeError(f"Failed to delete {len(errors)} objects under {bucket}/{prefix}")
@@ -1,35 +1,37 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.models.camera import Camera
 from app.schemas.camera import CameraCreate, CameraUpdate
 
 
-def get(db: Session, camera_id: str) -> Camera | None:
-    return db.query(Camera).filter(Camera.id == camera_id).first()
+async def get(db: AsyncSession, camera_id: str) -> Camera | None:
+    return await db.get(Camera, camera_id)
 
 
-def get_multi(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(Camera).offset(skip).limit(limit).all()
+async def get_multi(db: AsyncSession, skip: int = 0, limit: int = 100):
+    result = await db.execute(select(Camera).offset(skip).limit(limit))
+    return result.scalars().all()
 
 
-def create(db: Session, camera_in: CameraCreate) -> Camera:
-    camera = Camera(**camera_in.dict())
+async def create(db: AsyncSession, camera_in: CameraCreate) -> Camera:
+    camera = Camera(**camera_in.model_dump())
     db.add(camera)
-    db.commit()
-    db.refresh(camera)
+    await db.commit()
+    await db.refresh(camera)
     return camera
 
 
-def update(db: Session, db_obj: Camera, camera_in: CameraUpdate) -> Camera:
-    for field, value in camera_in.dict(exclude_unset=True).items():
+async def update(db: AsyncSession, db_obj: Camera, camera_in: CameraUpdate) -> Camera:
+    for field, value in camera_in.model_dump(exclude_unset=True).items():
         setattr(db_obj, field, value)
-    db.commit()
-    db.refresh(db_obj)
+    await db.commit()
+    await db.refresh(db_obj)
     return db_obj
 
 
-def remove(db: Session, camera_id: str) -> Camera | None:
-    obj = get(db, camera_id)
+async def remove(db: AsyncSession, camera_id: str) -> Camera | None:
+    obj = await get(db, camera_id)
     if obj:
-        db.delete(obj)
-        db.commit()
+        await db.delete(obj)
+        await db.commit()
     return obj
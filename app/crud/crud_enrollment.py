@@ -0,0 +1,95 @@
+from sqlalchemy import select, func, text
+from sqlalchemy.orm import Session
+from app.db.models.enrollment import EnrollmentJob, EnrollmentItem
+from app.db.models.face import Face
+from app.db.models.person import Person
+from app.schemas.face import FaceCreate
+
+
+def get(db: Session, job_id: str) -> EnrollmentJob | None:
+    return db.query(EnrollmentJob).filter(EnrollmentJob.id == job_id).first()
+
+
+def get_multi(db: Session, skip: int = 0, limit: int = 100):
+    return db.query(EnrollmentJob).order_by(EnrollmentJob.id.desc()).offset(skip).limit(limit).all()
+
+
+def get_items(db: Session, job_id: str, status: str | None = None, skip: int = 0, limit: int = 100):
+    query = db.query(EnrollmentItem).filter(EnrollmentItem.job_id == job_id)
+    if status:
+        query = query.filter(EnrollmentItem.status == status)
+    return query.order_by(EnrollmentItem.key).offset(skip).limit(limit).all()
+
+
+def get_done_keys(db: Session, job_id: str) -> set[str]:
+    """Keys already processed by a job, used to resume it."""
+    return set(db.execute(select(EnrollmentItem.key).where(EnrollmentItem.job_id == job_id)).scalars())
+
+
+def get_existing_person_ids(db: Session, person_ids: list[str]) -> set[str]:
+    """Persons an enrollment can attach faces to."""
+    return set(db.execute(select(Person.id).where(Person.id.in_(person_ids))).scalars())
+
+
+def get_enrolled_faces(db: Session, job_id: str):
+    """Faces created by a job, for the final index commit."""
+    return (
+        db.query(Face)
+        .join(EnrollmentItem, EnrollmentItem.face_id == Face.id)
+        .filter(EnrollmentItem.job_id == job_id)
+        .all()
+    )
+
+
+def create(db: Session, source: str) -> EnrollmentJob:
+    job = EnrollmentJob(source=source, status="pending")
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def is_stale(db: Session, db_obj: EnrollmentJob, seconds: int) -> bool:
+    """Whether a running job has not reported progress for ``seconds``, e.g. because its worker died."""
+    return db.query(EnrollmentJob.id).filter(
+        EnrollmentJob.id == db_obj.id,
+        EnrollmentJob.status == "running",
+        EnrollmentJob.updated_at < func.date_sub(func.now(), text(f"INTERVAL {int(seconds)} SECOND")),
+    ).first() is not None
+
+
+def set_status(db: Session, db_obj: EnrollmentJob, status: str, total: int | None = None, error: str | None = None) -> EnrollmentJob:
+    db_obj.status = status
+    db_obj.error = error
+    # Doubles as the heartbeat checked by is_stale()
+    db_obj.updated_at = func.now()
+    if total is not None:
+        db_obj.total = total
+    db.commit()
+    db.refresh(db_obj)
+    return db_obj
+
+
+def record_batch(db: Session, db_obj: EnrollmentJob,
+                 enrolled: list[tuple[str, FaceCreate]],
+                 failures: list[tuple[str, str | None, str]]) -> EnrollmentJob:
+    """Bulk-insert the faces and item results of one batch in a single transaction."""
+    faces = [Face(**face_in.model_dump()) for _, face_in in enrolled]
+    db.add_all(faces)
+    db.flush()
+
+    items = [
+        EnrollmentItem(job_id=db_obj.id, key=key, person_id=face.person_id, face_id=face.id, status="enrolled")
+        for (key, _), face in zip(enrolled, faces)
+    ]
+    items += [
+        EnrollmentItem(job_id=db_obj.id, key=key[:255], person_id=person_id[:26] if person_id else None, status="failed", error=error[:255])
+        for key, person_id, error in failures
+    ]
+    db.add_all(items)
+
+    db_obj.succeeded = (db_obj.succeeded or 0) + len(enrolled)
+    db_obj.failed = (db_obj.failed or 0) + len(failures)
+    db.commit()
+    db.refresh(db_obj)
+    return db_obj
@@ -0,0 +1,109 @@
+from sqlalchemy import select, delete, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from app.db.models.gallery import Gallery, gallery_persons, camera_galleries
+from app.db.models.person import Person
+from app.schemas.gallery import GalleryCreate, GalleryUpdate
+
+
+async def get(db: AsyncSession, gallery_id: str) -> Gallery | None:
+    return await db.get(Gallery, gallery_id)
+
+
+async def get_multi(db: AsyncSession, skip: int = 0, limit: int = 100):
+    result = await db.execute(select(Gallery).order_by(Gallery.name).offset(skip).limit(limit))
+    return result.scalars().all()
+
+
+async def get_by_camera(db: AsyncSession, camera_id: str):
+    result = await db.execute(
+        select(Gallery).join(camera_galleries, camera_galleries.c.gallery_id == Gallery.id)
+        .where(camera_galleries.c.camera_id == camera_id)
+    )
+    return result.scalars().all()
+
+
+async def get_persons(db: AsyncSession, gallery_id: str):
+    result = await db.execute(
+        select(Person).options(selectinload(Person.faces))
+        .join(gallery_persons, gallery_persons.c.person_id == Person.id)
+        .where(gallery_persons.c.gallery_id == gallery_id)
+    )
+    return result.scalars().all()
+
+
+async def create(db: AsyncSession, gallery_in: GalleryCreate) -> Gallery:
+    gallery = Gallery(**gallery_in.model_dump())
+    db.add(gallery)
+    await db.commit()
+    await db.refresh(gallery)
+    return gallery
+
+
+async def update(db: AsyncSession, db_obj: Gallery, gallery_in: GalleryUpdate) -> Gallery:
+    for field, value in gallery_in.model_dump(exclude_unset=True).items():
+        setattr(db_obj, field, value)
+    await db.commit()
+    await db.refresh(db_obj)
+    return db_obj
+
+
+async def remove(db: AsyncSession, gallery_id: str) -> Gallery | None:
+    obj = await get(db, gallery_id)
+    if obj:
+        await db.execute(delete(gallery_persons).where(gallery_persons.c.gallery_id == gallery_id))
+        await db.execute(delete(camera_galleries).where(camera_galleries.c.gallery_id == gallery_id))
+        await db.delete(obj)
+        await db.commit()
+    return obj
+
+
+async def _link(db: AsyncSession, table, **values):
+    exists = await db.execute(select(table).filter_by(**values))
+    if exists.first() is None:
+        await db.execute(insert(table).values(**values))
+        await db.commit()
+
+
+async def _unlink(db: AsyncSession, table, **values):
+    await db.execute(delete(table).filter_by(**values))
+    await db.commit()
+
+
+async def add_person(db: AsyncSession, db_obj: Gallery, person_id: str) -> Gallery:
+    await _link(db, gallery_persons, gallery_id=db_obj.id, person_id=person_id)
+    return db_obj
+
+
+async def remove_person(db: AsyncSession, db_obj: Gallery, person_id: str) -> Gallery:
+    await _unlink(db, gallery_persons, gallery_id=db_obj.id, person_id=person_id)
+    return db_obj
+
+
+async def add_camera(db: AsyncSession, db_obj: Gallery, camera_id: str) -> Gallery:
+    await _link(db, camera_galleries, camera_id=camera_id, gallery_id=db_obj.id)
+    return db_obj
+
+
+async def remove_camera(db: AsyncSession, db_obj: Gallery, camera_id: str) -> Gallery:
+    await _unlink(db, camera_galleries, camera_id=camera_id, gallery_id=db_obj.id)
+    return db_obj
+
+
+async def get_person_ids(db: AsyncSession, gallery_ids: list[str]) -> set[str]:
+    """Person ids that belong to any of the given galleries."""
+    result = await db.execute(
+        select(gallery_persons.c.person_id).where(gallery_persons.c.gallery_id.in_(gallery_ids))
+    )
+    return set(result.scalars())
+
+
+async def get_person_ids_for_camera(db: AsyncSession, camera_id: str) -> set[str] | None:
+    """Search scope of a camera, or None when the camera is not bound to any gallery."""
+    result = await db.execute(
+        select(camera_galleries.c.gallery_id).where(camera_galleries.c.camera_id == camera_id)
+    )
+    gallery_ids = result.scalars().all()
+    if not gallery_ids:
+        return None
+    return await get_person_ids(db, gallery_ids)
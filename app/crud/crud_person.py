@@ -1,31 +1,34 @@
-from sqlalchemy import desc
-from sqlalchemy.orm import Session
+from sqlalchemy import desc, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from app.db.models.person import Person
 from app.schemas.person import PersonCreate, PersonUpdate
 
-def get(db: Session, person_id: str) -> Person | None:
-    return db.query(Person).filter(Person.id == person_id).first()
+async def get(db: AsyncSession, person_id: str) -> Person | None:
+    result = await db.execute(select(Person).options(selectinload(Person.faces)).where(Person.id == person_id))
+    return result.scalars().first()
 
-def get_multi(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(Person).order_by(desc(Person.id)).offset(skip).limit(limit).all()
+async def get_multi(db: AsyncSession, skip: int = 0, limit: int = 100):
+    result = await db.execute(
+        select(Person).options(selectinload(Person.faces)).order_by(desc(Person.id)).offset(skip).limit(limit)
+    )
+    return result.scalars().all()
 
-def create(db: Session, person_in: PersonCreate) -> Person:
+async def create(db: AsyncSession, person_in: PersonCreate) -> Person:
     person = Person(**person_in.model_dump())
     db.add(person)
-    db.commit()
-    db.refresh(person)
-    return person
+    await db.commit()
+    return await get(db, person.id)
 
-def update(db: Session, db_obj: Person, person_in: PersonUpdate) -> Person:
+async def update(db: AsyncSession, db_obj: Person, person_in: PersonUpdate) -> Person:
     for field, value in person_in.model_dump(exclude_unset=True).items():
         setattr(db_obj, field, value)
-    db.commit()
-    db.refresh(db_obj)
-    return db_obj
+    await db.commit()
+    return await get(db, db_obj.id)
 
-def remove(db: Session, person_id: str) -> Person | None:
-    obj = get(db, person_id)
+async def remove(db: AsyncSession, person_id: str) -> Person | None:
+    obj = await get(db, person_id)
     if obj:
-        db.delete(obj)
-        db.commit()
+        await db.delete(obj)
+        await db.commit()
     return obj
@@ -1,39 +1,175 @@
-from sqlalchemy.orm import Session
-from app.db.models.tracking import Tracking
+from datetime import datetime
+
+from sqlalchemy import select, delete, func, literal_column
+from sqlalchemy.dialects.mysql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from app.db.models.person import Person
+from app.db.models.tracking import Tracking, TrackingRollup
 from app.schemas.tracking import TrackingCreate, TrackingUpdate
 
+# Relations serialized by TrackingOutWithRelations
+_relations = (
+    selectinload(Tracking.person).selectinload(Person.faces),
+    selectinload(Tracking.camera),
+)
+
 
-def get(db: Session, tracking_id: str) -> Tracking | None:
-    return db.query(Tracking).filter(Tracking.id == tracking_id).first()
+async def get(db: AsyncSession, tracking_id: str) -> Tracking | None:
+    result = await db.execute(select(Tracking).options(*_relations).where(Tracking.id == tracking_id))
+    return result.scalars().first()
 
 
-def get_multi(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(Tracking).order_by(Tracking.timestamp.desc()).offset(skip).limit(limit).all()
+async def get_multi(db: AsyncSession, skip: int = 0, limit: int = 100):
+    result = await db.execute(
+        select(Tracking).options(*_relations).order_by(Tracking.timestamp.desc()).offset(skip).limit(limit)
+    )
+    return result.scalars().all()
 
 
-def get_by_person(db: Session, person_id: str):
-    return db.query(Tracking).filter(Tracking.person_id == person_id).order_by(Tracking.timestamp.desc()).all()
+async def get_by_person(db: AsyncSession, person_id: str):
+    result = await db.execute(
+        select(Tracking).options(*_relations).where(Tracking.person_id == person_id).order_by(Tracking.timestamp.desc())
+    )
+    return result.scalars().all()
 
 
-def create(db: Session, tracking_in: TrackingCreate) -> Tracking:
+async def create(db: AsyncSession, tracking_in: TrackingCreate) -> Tracking:
     tracking = Tracking(**tracking_in.model_dump())
     db.add(tracking)
-    db.commit()
-    db.refresh(tracking)
+    await db.flush()
+    await db.refresh(tracking)
+    await _add_to_rollup(db, tracking)
+    await db.commit()
     return tracking
 
 
-def update(db: Session, db_obj: Tracking, tracking_in: TrackingUpdate) -> Tracking:
+async def _add_to_rollup(db: AsyncSession, tracking: Tracking):
+    """Count a tracking row into its person/camera/hour rollup, in the caller's transaction."""
+    stmt = insert(TrackingRollup).values(
+        person_id=tracking.person_id,
+        camera_id=tracking.camera_id or "",
+        hour=tracking.timestamp.replace(minute=0, second=0, microsecond=0),
+        count=1,
+        first_seen=tracking.timestamp,
+        last_seen=tracking.timestamp,
+    )
+    stmt = stmt.on_duplicate_key_update(
+        count=TrackingRollup.count + 1,
+        first_seen=func.least(TrackingRollup.first_seen, stmt.inserted.first_seen),
+        last_seen=func.greatest(TrackingRollup.last_seen, stmt.inserted.last_seen),
+    )
+    await db.execute(stmt)
+
+
+async def get_rollups_by_person(db: AsyncSession, person_id: str, start: datetime, end: datetime):
+    """Hourly sightings of a person per camera between start and end."""
+    result = await db.execute(
+        select(TrackingRollup)
+        .where(TrackingRollup.person_id == person_id,
+               TrackingRollup.hour >= start.replace(minute=0, second=0, microsecond=0),
+               TrackingRollup.hour < end)
+        .order_by(TrackingRollup.hour, TrackingRollup.camera_id)
+    )
+    return result.scalars().all()
+
+
+async def get_visitors_by_camera(db: AsyncSession, camera_id: str, start: datetime, end: datetime):
+    """Persons seen by a camera between start and end, with counts and first/last sighting."""
+    result = await db.execute(
+        select(
+            TrackingRollup.person_id,
+            Person.name,
+            func.sum(TrackingRollup.count).label("count"),
+            func.min(TrackingRollup.first_seen).label("first_seen"),
+            func.max(TrackingRollup.last_seen).label("last_seen"),
+        )
+        .join(Person, Person.id == TrackingRollup.person_id)
+        .where(TrackingRollup.camera_id == camera_id,
+               TrackingRollup.hour >= start.replace(minute=0, second=0, microsecond=0),
+               TrackingRollup.hour < end)
+        .group_by(TrackingRollup.person_id, Person.name)
+        .order_by(literal_column("last_seen").desc())
+    )
+    return result.all()
+
+
+async def get_oldest_timestamp(db: AsyncSession) -> datetime | None:
+    return (await db.execute(select(func.min(Tracking.timestamp)))).scalar()
+
+
+async def iter_range(db: AsyncSession, start: datetime, end: datetime, page_size: int = 5000):
+    """Yield tracking rows in [start, end) page by page, in id order, without loading them all."""
+    last_id = ""
+    while True:
+        rows = (await db.execute(
+            select(Tracking)
+            .where(Tracking.timestamp >= start, Tracking.timestamp < end, Tracking.id > last_id)
+            .order_by(Tracking.id)
+            .limit(page_size)
+        )).scalars().all()
+        if not rows:
+            return
+        last_id = rows[-1].id
+        yield rows
+        db.expunge_all()
+
+
+async def remove_range(db: AsyncSession, start: datetime, end: datetime, batch_size: int = 5000) -> int:
+    """Delete tracking rows in [start, end) in batches, keeping each transaction short."""
+    removed = 0
+    while True:
+        ids = (await db.execute(
+            select(Tracking.id).where(Tracking.timestamp >= start, Tracking.timestamp < end).limit(batch_size)
+        )).scalars().all()
+        if not ids:
+            return removed
+        await db.execute(delete(Tracking).where(Tracking.id.in_(ids)))
+        await db.commit()
+        removed += len(ids)
+
+
+async def remove_ids(db: AsyncSession, ids: list[str], batch_size: int = 5000) -> int:
+    """Delete the given tracking rows in batches, keeping each transaction short."""
+    removed = 0
+    for start in range(0, len(ids), batch_size):
+        result = await db.execute(delete(Tracking).where(Tracking.id.in_(ids[start:start + batch_size])))
+        await db.commit()
+        removed += result.rowcount
+    return removed
+
+
+async def remove_rollups_before(db: AsyncSession, cutoff: datetime) -> int:
+    result = await db.execute(delete(TrackingRollup).where(TrackingRollup.hour < cutoff))
+    await db.commit()
+    return result.rowcount
+
+
+async def rebuild_rollups(db: AsyncSession):
+    """Recompute every rollup from the raw tracking rows."""
+    await db.execute(delete(TrackingRollup))
+    hour = func.date_format(Tracking.timestamp, "%Y-%m-%d %H:00:00")
+    camera_id = func.coalesce(Tracking.camera_id, "")
+    await db.execute(insert(TrackingRollup).from_select(
+        ["person_id", "camera_id", "hour", "count", "first_seen", "last_seen"],
+        select(Tracking.person_id, camera_id, hour, func.count(),
+               func.min(Tracking.timestamp), func.max(Tracking.timestamp))
+        .group_by(Tracking.person_id, camera_id, hour)
+    ))
+    await db.commit()
+
+
+async def update(db: AsyncSession, db_obj: Tracking, tracking_in: TrackingUpdate) -> Tracking:
     for field, value in tracking_in.model_dump(exclude_unset=True).items():
         setattr(db_obj, field, value)
-    db.commit()
-    db.refresh(db_obj)
+    await db.commit()
+    await db.refresh(db_obj)
     return db_obj
 
 
-def remove(db: Session, tracking_id: str) -> Tracking | None:
-    obj = get(db, tracking_id)
+async def remove(db: AsyncSession, tracking_id: str) -> Tracking | None:
+    obj = await get(db, tracking_id)
     if obj:
-        db.delete(obj)
-        db.commit()
+        await db.delete(obj)
+        await db.commit()
     return obj
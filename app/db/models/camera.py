@@ -1,5 +1,5 @@
 import ulid
-from sqlalchemy import Column, String
+from sqlalchemy import Column, String, Integer, JSON
 from sqlalchemy.orm import relationship
 
 from app.db.base import Base
@@ -12,5 +12,10 @@ class Camera(Base):
     id = Column(String(26), primary_key=True, default=lambda: str(ulid.new()))
     location = Column(String(100), nullable=False)
     ip = Column(String(100), nullable=True)
+    # Detection settings, see app.core.face_analysis.detect_faces
+    det_size = Column(Integer, nullable=True)
+    det_max_side = Column(Integer, nullable=True)
+    roi = Column(JSON, nullable=True)
 
     trackings = relationship("Tracking", back_populates="camera", cascade="all, delete-orphan")
+    galleries = relationship("Gallery", secondary="camera_galleries", back_populates="cameras")
@@ -0,0 +1,38 @@
+import ulid
+from sqlalchemy import Column, String, DateTime, ForeignKey, Integer, func, UniqueConstraint
+from sqlalchemy.orm import relationship
+
+from app.db.base import Base
+
+
+# 📥 Enrollment Job Table (one bulk enrollment run)
+class EnrollmentJob(Base):
+    __tablename__ = "enrollment_jobs"
+
+    id = Column(String(26), primary_key=True, default=lambda: str(ulid.new()))
+    source = Column(String(255), nullable=False)
+    status = Column(String(20), nullable=False, default="pending")
+    total = Column(Integer, default=0)
+    succeeded = Column(Integer, default=0)
+    failed = Column(Integer, default=0)
+    error = Column(String(255), nullable=True)
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    items = relationship("EnrollmentItem", back_populates="job", cascade="all, delete-orphan", passive_deletes=True)
+
+
+# 🧾 Enrollment Item Table (per-image result of a job)
+class EnrollmentItem(Base):
+    __tablename__ = "enrollment_items"
+    __table_args__ = (UniqueConstraint("job_id", "key", name="uq_enrollment_item_key"),)
+
+    id = Column(String(26), primary_key=True, default=lambda: str(ulid.new()))
+    job_id = Column(String(26), ForeignKey("enrollment_jobs.id", ondelete="CASCADE", onupdate="CASCADE"), nullable=False)
+    key = Column(String(255), nullable=False)
+    person_id = Column(String(26), nullable=True)
+    face_id = Column(String(26), nullable=True)
+    status = Column(String(20), nullable=False)
+    error = Column(String(255), nullable=True)
+
+    job = relationship("EnrollmentJob", back_populates="items")
@@ -12,8 +12,9 @@ class Face(Base):
     id = Column(String(26), primary_key=True, default=lambda: str(ulid.new()))
     person_id = Column(String(26), ForeignKey("persons.id", ondelete="CASCADE", onupdate="CASCADE"), nullable=False)
     embedding = Column(JSON, nullable=False)
-    is_male = Column(Boolean, default=True)
-    age = Column(Integer, default=0)
+    # NULL when the model pack was loaded without the genderage module
+    is_male = Column(Boolean, nullable=True)
+    age = Column(Integer, nullable=True)
     photo_path = Column(String(255), nullable=False)
     created_at = Column(DateTime, server_default=func.now())
 
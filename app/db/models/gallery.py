@@ -0,0 +1,34 @@
+import ulid
+from sqlalchemy import Column, String, DateTime, ForeignKey, Table, func
+from sqlalchemy.orm import relationship
+
+from app.db.base import Base
+
+# 🔗 Gallery ↔ Person membership
+gallery_persons = Table(
+    "gallery_persons",
+    Base.metadata,
+    Column("gallery_id", String(26), ForeignKey("galleries.id", ondelete="CASCADE", onupdate="CASCADE"), primary_key=True),
+    Column("person_id", String(26), ForeignKey("persons.id", ondelete="CASCADE", onupdate="CASCADE"), primary_key=True),
+)
+
+# 🔗 Camera → Galleries it searches
+camera_galleries = Table(
+    "camera_galleries",
+    Base.metadata,
+    Column("camera_id", String(26), ForeignKey("cameras.id", ondelete="CASCADE", onupdate="CASCADE"), primary_key=True),
+    Column("gallery_id", String(26), ForeignKey("galleries.id", ondelete="CASCADE", onupdate="CASCADE"), primary_key=True),
+)
+
+
+# 🗂️ Gallery Table (named watchlist of persons)
+class Gallery(Base):
+    __tablename__ = "galleries"
+
+    id = Column(String(26), primary_key=True, default=lambda: str(ulid.new()))
+    name = Column(String(100), nullable=False, unique=True)
+    note = Column(String(255), nullable=True)
+    created_at = Column(DateTime, server_default=func.now())
+
+    persons = relationship("Person", secondary=gallery_persons, back_populates="galleries")
+    cameras = relationship("Camera", secondary=camera_galleries, back_populates="galleries")
@@ -14,3 +14,4 @@ class Person(Base):
 
     faces = relationship("Face", back_populates="person", cascade="all, delete-orphan", passive_deletes=True)
     trackings = relationship("Tracking", back_populates="person", cascade="all, delete-orphan")
+    galleries = relationship("Gallery", secondary="gallery_persons", back_populates="persons")
@@ -1,11 +1,16 @@
 import ulid
-from sqlalchemy import Column, String, Float, ForeignKey, DateTime, func, Integer
+from sqlalchemy import Column, String, Float, ForeignKey, DateTime, func, Integer, Index
 from sqlalchemy.orm import relationship
 from app.db.base import Base
 
 # 📌 Tracking Table (links Face + Camera)
 class Tracking(Base):
     __tablename__ = "tracking"
+    __table_args__ = (
+        Index("ix_tracking_timestamp", "timestamp"),
+        Index("ix_tracking_person_timestamp", "person_id", "timestamp"),
+        Index("ix_tracking_camera_timestamp", "camera_id", "timestamp"),
+    )
 
     id = Column(String(26), primary_key=True, default=lambda: str(ulid.new()))
     person_id = Column(String(26), ForeignKey("persons.id", ondelete="CASCADE", onupdate="CASCADE"), nullable=False)
@@ -22,3 +27,18 @@ class Tracking(Base):
     # Relationship to the Camera table
     camera = relationship("Camera", back_populates="trackings")
 
+
+# 🕐 Hourly Tracking Rollup (maintained on every tracking insert)
+class TrackingRollup(Base):
+    __tablename__ = "tracking_hourly"
+    __table_args__ = (
+        Index("ix_tracking_hourly_camera_hour", "camera_id", "hour"),
+    )
+
+    person_id = Column(String(26), primary_key=True)
+    # "" when the frame had no camera, so the key stays unique
+    camera_id = Column(String(26), primary_key=True, default="")
+    hour = Column(DateTime, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    first_seen = Column(DateTime, nullable=False)
+    last_seen = Column(DateTime, nullable=False)
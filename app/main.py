@@ -1,12 +1,13 @@
-import json
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from starlette.middleware.cors import CORSMiddleware
 from app.api.route_v1 import router
+from app.controllers.face_controller import detection_index, frame_scheduler
+from app.core.events import event_broker
 from app.core.faiss_manager import FaissIndexManager
 from app.db.base import Base
 from app.db.models.face import Face
-from app.db.session import engine, SessionLocal
+from app.db.session import engine, SessionLocal, async_engine
 
 Base.metadata.create_all(bind=engine)
 
@@ -23,35 +24,25 @@ async def lifespan(app: FastAPI):
 
         db = SessionLocal()
         try:
-            faces = db.query(Face).all()
-            embeddings = []
-            metadata = []
-
-            for face in faces:
-                if not face.embedding or not face.person_id:
-                    continue
-                emb = face.embedding
-                if isinstance(emb, str):
-                    try:
-                        emb = json.loads(emb)
-                    except json.JSONDecodeError:
-                        continue
-                if isinstance(emb, list) and len(emb) == 512:
-                    embeddings.append(emb)
-                    metadata.append({"person_id": face.person_id})
+            indexed = index_manager.build_from_faces(db.query(Face).all())
         finally:
             db.close()
 
-        if embeddings:
-            index_manager.build(embeddings, metadata)
+        if indexed:
             print("FAISS index built and saved.")
         else:
             print("No valid embeddings found in DB.")
     else:
         print("Loaded FAISS index from disk.")
 
+    detection_index.start()
+    await event_broker.start()
+    await frame_scheduler.start()
     yield
-    # Cleanup if needed
+    await frame_scheduler.stop()
+    await event_broker.stop()
+    detection_index.stop()
+    await async_engine.dispose()
 
 app = FastAPI(title="Face Stream API Docs", lifespan=lifespan)
 
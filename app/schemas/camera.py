@@ -1,10 +1,41 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, field_validator
+from typing import Optional, List
+
+
+def _check_roi(roi: Optional[List[float]]) -> Optional[List[float]]:
+    if roi is None:
+        return roi
+    if len(roi) != 4:
+        raise ValueError("roi must be [x1, y1, x2, y2]")
+    x1, y1, x2, y2 = roi
+    if not (0 <= x1 < x2 <= 1 and 0 <= y1 < y2 <= 1):
+        raise ValueError("roi must hold fractions of the frame with x1 < x2 and y1 < y2")
+    return roi
+
+
+def _check_det_size(det_size: Optional[int]) -> Optional[int]:
+    # The detector's feature strides go up to 32
+    if det_size is not None and (det_size <= 0 or det_size % 32):
+        raise ValueError("det_size must be a positive multiple of 32")
+    return det_size
+
+
+def _check_det_max_side(det_max_side: Optional[int]) -> Optional[int]:
+    if det_max_side is not None and det_max_side <= 0:
+        raise ValueError("det_max_side must be positive")
+    return det_max_side
 
 
 class CameraBase(BaseModel):
     location: str
     ip: Optional[str] = None
+    det_size: Optional[int] = None
+    det_max_side: Optional[int] = None
+    roi: Optional[List[float]] = None
+
+    _validate_roi = field_validator("roi")(_check_roi)
+    _validate_det_size = field_validator("det_size")(_check_det_size)
+    _validate_det_max_side = field_validator("det_max_side")(_check_det_max_side)
 
 
 class CameraCreate(CameraBase):
@@ -14,6 +45,13 @@ class CameraCreate(CameraBase):
 class CameraUpdate(BaseModel):
     location: Optional[str] = None
     ip: Optional[str] = None
+    det_size: Optional[int] = None
+    det_max_side: Optional[int] = None
+    roi: Optional[List[float]] = None
+
+    _validate_roi = field_validator("roi")(_check_roi)
+    _validate_det_size = field_validator("det_size")(_check_det_size)
+    _validate_det_max_side = field_validator("det_max_side")(_check_det_max_side)
 
 
 class CameraOut(CameraBase):
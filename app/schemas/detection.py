@@ -0,0 +1,18 @@
+from datetime import datetime
+from typing import List, Optional
+from pydantic import BaseModel
+
+
+class DetectionItem(BaseModel):
+    id: str
+    camera_id: Optional[str] = None
+    person_id: Optional[str] = None
+    photo: str
+    timestamp: datetime
+    similarity: float
+
+
+class DetectionSearchResult(BaseModel):
+    matches: List[DetectionItem]
+    search_time_ms: int
+    entries_searched: int
@@ -0,0 +1,29 @@
+from datetime import datetime
+from typing import Optional
+from pydantic import BaseModel
+
+
+class EnrollmentItemOut(BaseModel):
+    key: str
+    person_id: Optional[str] = None
+    face_id: Optional[str] = None
+    status: str
+    error: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+
+class EnrollmentJobOut(BaseModel):
+    id: str
+    source: str
+    status: str
+    total: int
+    succeeded: int
+    failed: int
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -5,8 +5,8 @@ from typing import List
 class FaceBase(BaseModel):
     person_id: str
     embedding: List[float]
-    is_male: bool
-    age: int
+    is_male: bool | None = None
+    age: int | None = None
     photo_path: str
 
 
@@ -21,8 +21,8 @@ class FaceUpdate(BaseModel):
 
 class FaceOut(BaseModel):
     id: str
-    is_male: bool
-    age: int
+    is_male: bool | None = None
+    age: int | None = None
     photo_path: str
 
     class Config:
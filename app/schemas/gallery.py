@@ -0,0 +1,25 @@
+from datetime import datetime
+from typing import Optional
+from pydantic import BaseModel
+
+
+class GalleryBase(BaseModel):
+    name: str
+    note: Optional[str] = None
+
+
+class GalleryCreate(GalleryBase):
+    pass
+
+
+class GalleryUpdate(BaseModel):
+    name: Optional[str] = None
+    note: Optional[str] = None
+
+
+class GalleryOut(GalleryBase):
+    id: str
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
@@ -1,6 +1,6 @@
 from datetime import datetime
 from typing import Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
 from app.schemas.camera import CameraOut
 from app.schemas.person import PersonOut
 
@@ -45,4 +45,41 @@ class TrackingMatchOut(BaseModel):
     time_taken: int
     index_size: int
     timestamp: datetime
-    person: PersonOut
\ No newline at end of file
+    person: PersonOut
+
+class TrackingEvent(BaseModel):
+    id: str
+    person_id: str
+    camera_id: Optional[str] = None
+    similarity: Optional[float] = None
+    photo: str
+    timestamp: datetime
+
+    class Config:
+        from_attributes = True
+
+class TrackingRollupOut(BaseModel):
+    person_id: str
+    camera_id: Optional[str] = None
+    hour: datetime
+    count: int
+    first_seen: datetime
+    last_seen: datetime
+
+    @field_validator("camera_id")
+    @classmethod
+    def no_camera(cls, value: Optional[str]) -> Optional[str]:
+        return value or None
+
+    class Config:
+        from_attributes = True
+
+class CameraVisitorOut(BaseModel):
+    person_id: str
+    name: str
+    count: int
+    first_seen: datetime
+    last_seen: datetime
+
+    class Config:
+        from_attributes = True
@@ -43,6 +43,7 @@ ExecStart=$VENV_DIR/bin/gunicorn app.main:app \\
     --workers $(nproc --all)
 Restart=always
 Environment=PATH=$VENV_DIR/bin
+Environment=WEB_CONCURRENCY=$(nproc --all)
 
 [Install]
 WantedBy=multi-user.target